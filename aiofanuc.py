@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+import asyncio,time,os,codecs
+from struct import pack,unpack
+from pyfanuc import pyfanuc
+
+class AsyncFanuc(pyfanuc):
+	"""
+	asyncio variant of pyfanuc
+	uses the same codec (_encap/_decap/_decode8) and request specs,
+	all requests and getters are coroutines (iterators are async generators),
+	the stream transport has its own names (_arecvframe/_areq_rdframe/_aqueries ...)
+	so inherited code can not pick up a coroutine where it expects a result
+	"""
+	def __init__(self, ip, port=8193, timeout=5, stats=None, cache=None):
+		pyfanuc.__init__(self,ip,port,cache,stats)
+		self.timeout=timeout
+		self.reader=None
+		self.writer=None
+		self.lock=asyncio.Lock()
+
+	async def _open(self,dst):
+		"intern function - open stream and send OPN request for frame destination"
+		reader,writer=await asyncio.wait_for(asyncio.open_connection(self.ip,self.port),self.timeout)
+		try:
+			writer.write(self._encap(pyfanuc.FTYPE_OPN_REQU,dst))
+			data=self._decap(await self._arecvframe(reader))
+		except BaseException:
+			await self._close(writer)
+			raise
+		return reader,writer,data
+	async def _arecvframe(self,reader=None):
+		"intern function - receive exactly one frame (header + announced length)"
+		if reader is None:
+			reader=self.reader
+		head=await asyncio.wait_for(reader.readexactly(10),self.timeout)
+		if head[0:4]!=pyfanuc.FRAMEHEAD:
+			return head
+		return head+await asyncio.wait_for(reader.readexactly(unpack(">H",head[8:10])[0]),self.timeout)
+	async def _close(self,writer):
+		"intern function - close stream"
+		writer.close()
+		try:
+			await writer.wait_closed()
+		except OSError:
+			pass
+
+	async def connect(self,fast=False):
+		"""
+		Establish connection to machine and set parameters with sysinfo
+		fast=True takes sysinfo and axis metadata from cache, see pyfanuc.connect
+		"""
+		self.reader,self.writer,data=await self._open(self.dst)
+		if data.get("ftype")==pyfanuc.FTYPE_OPN_RESP:
+			self.connected=True
+			if self.stats is not None:
+				self.stats.connect(self.ip)
+			meta=self.cache.get(self.ip) if fast and self.cache is not None else None
+			if meta:
+				self._setmeta(meta)
+				self.revalidate=True
+			else:
+				await self._aloadmeta()
+		else:
+			await self._close(self.writer)
+		return self.connected
+	async def _aloadmeta(self):
+		"intern function - read sysinfo/statinfo (and axis metadata for the cache) in one frame"
+		q=[self._q_getsysinfo(),self._q_getstatinfo()]
+		if self.cache is not None:
+			q+=[self._q_readaxisnames(),self._q_readspindlenames(),self._q_readaxiscount()]
+		await self._aqueries(q)
+		if self.cache is not None and getattr(self,"sysinfo",None):
+			self.cache.put(self.ip,self._getmeta())
+	async def disconnect(self):
+		"Disconnect the connection to the machine"
+		if self.writer is None:
+			return False
+		try:
+			if self.connected:
+				async with self.lock:
+					self.writer.write(self._encap(pyfanuc.FTYPE_CLS_REQU,b''))
+					data=self._decap(await self._arecvframe())
+				return data.get("ftype")==pyfanuc.FTYPE_CLS_RESP
+		except (OSError,asyncio.TimeoutError,asyncio.IncompleteReadError):
+			pass
+		finally:
+			self.connected=False
+			await self._close(self.writer)
+			self.writer=None
+		return False
+
+	async def _areq_rdframe(self,subs,data=None):
+		"intern function - send subpackets in one frame (data: already encapsulated), returns one result per subpacket"
+		if data is None:
+			data=self._encap(pyfanuc.FTYPE_VAR_REQU,subs)
+		async with self.lock:
+			if self.stats is not None:
+				return await self._areq_rdframestat(subs,data)
+			self.writer.write(data)
+			t=self._decap(await self._arecvframe())
+		return self._req_split(subs,t)
+	async def _areq_rdframestat(self,subs,data):
+		"intern function - _areq_rdframe recording latency, bytes, results and timeouts into stats"
+		start=time.perf_counter()
+		try:
+			self.writer.write(data)
+			resp=await self._arecvframe()
+		except asyncio.TimeoutError:
+			self.stats.timeout(self.ip,subs,time.perf_counter()-start)
+			raise
+		r=self._req_split(subs,self._decap(resp))
+		self.stats.frame(self.ip,subs,r,time.perf_counter()-start,len(data),len(resp))
+		return r
+	async def _areq_rdsingle(self,c1,c2,c3,v1=0,v2=0,v3=0,v4=0,v5=0,pl=b""):
+		"intern function - pack simple command"
+		if self.revalidate:
+			await self._aqueries([])
+		r=await self._areq_rdframe([self._req_rdsub(c1,c2,c3,v1,v2,v3,v4,v5)+pl])
+		return r[0] if r else {"len":-1}
+	async def _aqueries(self,queries,plan=None):
+		"intern function - run request specs coalesced into as few frames as possible"
+		if self.revalidate:
+			self.revalidate=False
+			ret=await self._aqueries([self._q_revalidate()]+queries)
+			if ret[0]:
+				await self._aloadmeta()
+			return ret[1:]
+		frames,data=plan if plan is not None else (self._req_plan(queries),None)
+		if data is None:
+			data=[None]*len(frames)
+		st=[]
+		for f,d in zip(frames,data):
+			r=await self._areq_rdframe(f,d)
+			st.extend(r if r else [{"len":-1}]*len(f))
+		ret=[];n=0
+		for q in queries:
+			ret.append(q[1](self,st[n:n+len(q[0])],*q[2]))
+			n+=len(q[0])
+		return ret
+	async def _aquery(self,query):
+		"intern function - run single request spec"
+		return (await self._aqueries([query]))[0]
+	async def _batch(self,queries):
+		"intern function - run collected reads of a batch (await batch.execute())"
+		return await self._aqueries(queries)
+	async def _template(self,t):
+		"intern function - run prepared template (await template.execute(conn))"
+		r=await self._aqueries(t.queries,(t.frames,t.data))
+		return r[0] if t.single else r
+
+	async def getsysinfo(self):
+		return await self._aquery(self._q_getsysinfo())
+	async def getstatinfo(self):
+		return await self._aquery(self._q_getstatinfo())
+	async def getdate(self):
+		return await self._aquery(self._q_getdate())
+	async def gettime(self):
+		return await self._aquery(self._q_gettime())
+	async def getdatetime(self):
+		return await self._aquery(self._q_getdatetime())
+	async def readaxes(self,what=1,axis=pyfanuc.ALLAXIS):
+		return await self._aquery(self._q_readaxes(what,axis))
+	async def readparam(self,axis,first,last=0):
+		return await self._aquery(self._q_readparam(axis,first,last))
+	async def readparam2(self,axis,first,last=0):
+		return await self._aquery(self._q_readparam2(axis,first,last))
+	async def readdiag(self,axis,first,last=0):
+		return await self._aquery(self._q_readdiag(axis,first,last))
+	async def iterparam(self,first=0,last=0,axis=pyfanuc.ALLAXIS,numbers=None,diag=False):
+		"async generator of pyfanuc.iterparam"
+		frames,dec,numbers=self._iterparam_plan(first,last,axis,numbers,diag)
+		for f in frames:
+			for k,v in self._iterparam_frame(f,await self._areq_rdframe(f),dec,numbers):
+				yield k,v
+	async def readmacro(self,first,last=0):
+		return await self._aquery(self._q_readmacro(first,last))
+	async def readmacros(self,first,last,double=False):
+		result=await self._aquery(self._q_readmacros(first,last,double))
+		missing=[n for n in range(first,last+1) if n not in result]
+		if missing:
+			for n,v in zip(missing,await self._aqueries([self._q_readmacros(n,n,double) for n in missing])):
+				result[n]=v.get(n)
+		return result
+	async def readpmc(self,datatype,section,first,count=1):
+		return await self._aquery(self._q_readpmc(datatype,section,first,count))
+	async def readexecprog(self,chars=256):
+		return await self._aquery(self._q_readexecprog(chars))
+	async def readprognum(self):
+		return await self._aquery(self._q_readprognum())
+	async def readprogname(self):
+		return await self._aquery(self._q_readprogname())
+	async def readalarm(self):
+		return await self._aquery(self._q_readalarm())
+	async def readalarmcode(self,type,withtext=0,maxmsgs=-1,textlength=32):
+		return await self._aquery(self._q_readalarmcode(type,withtext,maxmsgs,textlength))
+	async def readdir_current(self,fgbg=1):
+		return await self._aquery(self._q_readdir_current(fgbg))
+	async def readdir_info(self,dir):
+		return await self._aquery(self._q_readdir_info(dir))
+	async def readdir(self,dir,first=0,count=10,type=0,size=1):
+		return await self._aquery(self._q_readdir(dir,first,count,type,size))
+	async def readactfeed(self):
+		return await self._aquery(self._q_readactfeed())
+	async def readactspindlespeed(self):
+		return await self._aquery(self._q_readactspindlespeed())
+	async def readactspindleload(self):
+		return await self._aquery(self._q_readactspindleload())
+	async def readaxisnames(self):
+		return await self._aquery(self._q_readaxisnames())
+	async def readspindlenames(self):
+		return await self._aquery(self._q_readspindlenames())
+	async def readaxiscount(self):
+		return await self._aquery(self._q_readaxiscount())
+
+	async def iterdir(self,dir,recursive=False):
+		"async generator of pyfanuc.iterdir (same paging, pages sent together)"
+		n=max(1,self.maxsubresp//128)
+		step=max(1,self.maxresp//(n*128+16))
+		dirs=[dir]
+		while dirs:
+			q=[]
+			for d in dirs:
+				q.append(self._q_readdir_info(d))
+				q.append(self._q_readdir(d,0,n)+([n*128],))
+			r=await self._aqueries(q)
+			pages=[];subdirs=[]
+			for i,d in enumerate(dirs):
+				info=r[2*i]
+				if info is None:
+					continue
+				total=info['dirs']+info['files']
+				pages.extend((d,first,min(n,total-first)) for first in range(n,total,n))
+				for e in self._iterdir_page(d,r[2*i+1] or [],recursive,subdirs):
+					yield e
+			for t in range(0,len(pages),step):
+				part=pages[t:t+step]
+				r=await self._aqueries([self._q_readdir(d,first,count)+([count*128],) for d,first,count in part])
+				for (d,first,count),x in zip(part,r):
+					for e in self._iterdir_page(d,x or [],recursive,subdirs):
+						yield e
+			dirs=subdirs if recursive else []
+	async def readdir_complete(self,dir):
+		return [e async for e in self.iterdir(dir)]
+	async def listprog(self,start=1):
+		ret={}
+		while True:
+			st=await self._areq_rdsingle(1,1,0x06,start,0x13,2)
+			if st["len"] < -1:
+				return None
+			elif st["len"]<=0:
+				return ret
+			for t in range(0,st["len"],72):
+				number,size,comment=unpack(">II64s",st["data"][t:t+72])
+				comment=comment.split(b'\0', 1)[0]
+				start=number+1
+				ret[number]={"size":size,"comment":comment.decode()}
+	async def settime(self,h=-1,m=0,s=0):
+		"""
+		Set Time to Parameter-Values or actual PC-Time
+		"""
+		if h==-1:
+			t=time.localtime()
+			h,m,s=t.tm_hour,t.tm_min,t.tm_sec
+		r=await self._areq_rdframe([self._req_rdsub(1,1,0x46,1,0,0,0,12)+b'\x00'*6+pack(">HHH",h,m,s)])
+		if r:
+			return r[0].get("error",0)
+	async def deleteprog(self,fullpath):
+		if not fullpath.startswith("//"):
+			raise Exception("FULL PATH must start with '//'")
+		buffer=bytearray(0x100)
+		bdir=fullpath.encode()
+		buffer[0:len(bdir)]=bdir
+		st=await self._areq_rdsingle(1,1,0xb6,0,0,0,0,256,buffer)
+		if st["len"] >= 0:
+			return True
+		if "error" in st:
+			raise Exception(f"Delete failed, error={st['error']}")
+		raise Exception("Delete failed (unknown error)")
+
+	async def getprog(self,name,progress=None):
+		"""
+		Get program-file
+		requests filename
+		returns filecontent
+		"""
+		f=[]
+		async for chunk in self._aiterprog(name,progress):
+			if chunk is None:
+				return -1
+			f.append(chunk)
+		return ''.join(f)
+	async def iterprog(self,name,progress=None):
+		"async generator of pyfanuc.iterprog"
+		async for chunk in self._aiterprog(name,progress):
+			if chunk is None:
+				raise Exception("Invalid frame in program transfer")
+			yield chunk
+	async def saveprog(self,name,file,progress=None):
+		"""
+		Write program-file to file (path or binary file object) as the data frames arrive
+		returns number of bytes written or -1
+		"""
+		if isinstance(file,(str,bytes,os.PathLike)):
+			with open(file,"wb") as fo:
+				return await self.saveprog(name,fo,progress)
+		n=0
+		async for chunk in self._aiterprog(name,progress,True):
+			if chunk is None:
+				return -1
+			file.write(chunk)
+			n+=len(chunk)
+		return n
+	async def getproghead(self,name,chars=256):
+		"Get the head (first chars characters) of a program file"
+		f=bytearray()
+		it=self._aiterprog(name,raw=True)
+		try:
+			async for chunk in it:
+				if chunk is None:
+					return -1
+				f+=chunk[:chars-len(f)]
+				if len(f)>=chars:
+					break
+		finally:
+			await it.aclose()
+		return f.decode(errors='ignore')
+	async def _aiterprog(self,name,progress=None,raw=False):
+		"""
+		intern function - program transfer on own stream
+		yields text chunks (raw: bytes), None on invalid frame
+		"""
+		q=self._progname(name)
+		if q is None:
+			yield None
+			return
+		buffer=bytearray(0x204)
+		buffer[0:4]=b'\x00\x00\x00\x01'
+		buffer[4:4+len(q)]=q
+		dec=codecs.getincrementaldecoder("utf-8")()
+		reader,writer,data=await self._open(pyfanuc.FRAME_DST2)
+		try:
+			writer.write(self._encap(0x1501,buffer))
+			self._decap(await self._arecvframe(reader))
+			n=0
+			while True:
+				frame=await self._arecvframe(reader)
+				if frame[0:4]!=pyfanuc.FRAMEHEAD:
+					yield None
+					return
+				ftype,flen=unpack(">HH",frame[6:10])
+				if ftype==0x1604:
+					n+=flen
+					if flen>0:
+						yield frame[10:] if raw else dec.decode(frame[10:])
+					if progress is not None:
+						progress(n)
+				elif ftype==0x1701:
+					writer.write(self._encap(0x1702,b''))
+					await writer.drain()
+					if not raw:
+						rest=dec.decode(b'',True)
+						if rest:
+							yield rest
+					return
+		finally:
+			await self._close(writer)
+	async def uploadprog(self,fullpath,content,progress=None,chunksize=0xF0,frames=32):
+		"""
+		Upload program-file to CNC (File I/O mode), see pyfanuc.uploadprog
+		fullpath: FULL PATH of folder only, e.g. "//MEMCARD/"
+		content: program text including Oxxxx (str/bytes or iterable of str/bytes)
+		"""
+		if not fullpath.startswith("//"):
+			raise Exception(f"FULL PATH must start with '//', got: {fullpath}")
+		folder_bytes=("N:"+fullpath).encode()
+		reader,writer,data=await self._open(pyfanuc.FRAME_DST2)
+		try:
+			buffer=bytearray(0x204)
+			buffer[0:4]=b'\x00\x00\x00\x01'
+			buffer[4:4+len(folder_bytes)]=folder_bytes
+			writer.write(self._encap(0x1101,buffer))
+			data=self._decap(await self._arecvframe(reader))
+			start=time.monotonic()
+			for out,sent in self._uploadframes(content,chunksize,frames):
+				writer.write(out)
+				await writer.drain()
+				if progress is not None:
+					progress(sent,sent/max(time.monotonic()-start,1e-6))
+			data=self._decap(await self._arecvframe(reader))
+			return self._uploadresult(data)
+		finally:
+			await self._close(writer)
+	async def uploadfile(self,fullpath,file,progress=None,chunksize=0xF0,frames=32):
+		"""
+		Upload program-file from path or file object, read incrementally
+		see uploadprog
+		"""
+		if isinstance(file,(str,bytes,os.PathLike)):
+			with open(file,"rb") as fo:
+				return await self.uploadfile(fullpath,fo,progress,chunksize,frames)
+		size=chunksize*frames
+		return await self.uploadprog(fullpath,iter(lambda:file.read(size),file.read(0)),progress,chunksize,frames)
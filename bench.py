@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for codec, request round trips, program transfer and fleet polling against fanucsim
+results are written as json, with --baseline the run is compared and exits with 1 on regressions
+
+python3 bench.py --rtt 0,0.001,0.005 --sessions 1,16 --out bench_output.txt
+"""
+import sys,time,json,argparse,platform,threading
+from pyfanuc import pyfanuc,_numpy
+from fanucsim import fanucsim
+from fleet import fleetpoller
+
+def rate(fn,duration):
+	"calls of fn per second within duration seconds"
+	n=0
+	start=time.perf_counter()
+	end=start+duration
+	while True:
+		fn()
+		n+=1
+		now=time.perf_counter()
+		if now>=end:
+			return n/(now-start)
+
+def bench_codec(conn,sim,duration):
+	"encap/decap frames per second and 8 byte values decoded per second"
+	subs=[conn._req_rdsub(1,1,0x26,w,-1) for u,v,w in pyfanuc.AXVALUES]+[conn._req_rdsub(1,1,0x24),conn._req_rdsub(1,1,0x1a)]
+	frame=sim._frame(0x2102,sim._multi(conn._encap(pyfanuc.FTYPE_VAR_REQU,subs)[10:]))
+	values=bytes.fromhex("002f7ae9000a0004")*1000
+	yield "encap",rate(lambda:conn._encap(pyfanuc.FTYPE_VAR_REQU,subs),duration),"frames/s"
+	yield "decap",rate(lambda:conn._decap(frame),duration),"frames/s"
+	yield "decode8",rate(lambda:conn._decode8(values,0),duration),"values/s"
+	yield "decode8list",rate(lambda:conn._decode8list(values,0,1000),duration)*1000,"values/s"
+
+def bench_requests(conn,sim,duration):
+	"round trips per second of the getters"
+	sim.macros.update((n,n/10) for n in range(1,1001))
+	yield "readaxes",rate(lambda:conn.readaxes(pyfanuc.ABS|pyfanuc.REL|pyfanuc.REF),duration),"requests/s"
+	yield "readparam",rate(lambda:conn.readparam2(-1,1320),duration),"requests/s"
+	yield "readmacro",rate(lambda:conn.readmacro(1,100),duration),"requests/s"
+	yield "readmacros",rate(lambda:conn.readmacros(1,1000),duration),"requests/s"
+	yield "readpmc",rate(lambda:conn.readpmc(0,5,0,1000),duration),"requests/s"
+	b=conn.batch()
+	b.readaxes(pyfanuc.ABS|pyfanuc.REL);b.readactfeed();b.readalarm();b.readprognum();b.getstatinfo()
+	t=b.prepare()
+	yield "template",rate(t.execute,duration),"requests/s"
+
+def bench_transfer(conn,sim,size):
+	"program download and upload in MB/s"
+	line="G01 X123.456 Y-78.901 Z0.5 F1500\n"
+	text="%\nO9000(BENCH)\n"+line*(size//len(line))+"%"
+	sim.programs[sim.cwd+"O9000"]=text
+	start=time.perf_counter()
+	n=len(conn.getprog(9000).encode())
+	yield "getprog",n/(time.perf_counter()-start)/1e6,"MB/s"
+	del sim.programs[sim.cwd+"O9000"]
+	start=time.perf_counter()
+	conn.uploadprog(sim.cwd,text)
+	yield "uploadprog",len(text)/(time.perf_counter()-start)/1e6,"MB/s"
+	sim.programs.pop(sim.cwd+"O9000",None)
+
+def bench_fleet(sim,sessions,duration):
+	"polls per second of fleetpoller with sessions machines on the simulator"
+	records=[0]
+	lock=threading.Lock()
+	def count(record):
+		with lock:
+			records[0]+=1
+	schedule={"axes":(0,"readaxes",(pyfanuc.ABS,)),"feed":(0,"readactfeed",()),"alarm":(0,"readalarm",())}
+	poller=fleetpoller([("127.0.0.1",sim.port)]*sessions,schedule,workers=min(sessions,64),callback=count)
+	with poller:
+		time.sleep(duration)
+	yield "fleet",records[0]/len(schedule)/duration,"polls/s"
+
+def run(rtts,sessions,duration,size):
+	"run all benchmarks, returns results"
+	results=[]
+	def add(group,rtt,items):
+		for name,value,unit in items:
+			results.append({"group":group,"name":name,"rtt":rtt,"sessions":None,"value":value,"unit":unit})
+	with fanucsim(errors={}) as sim:
+		conn=pyfanuc("127.0.0.1",sim.port)
+		conn.connect()
+		add("codec",None,bench_codec(conn,sim,duration))
+		for rtt in rtts:
+			sim.latency=rtt
+			add("requests",rtt,bench_requests(conn,sim,duration))
+		sim.latency=0
+		add("transfer",None,bench_transfer(conn,sim,size))
+		conn.disconnect()
+		for n in sessions:
+			for name,value,unit in bench_fleet(sim,n,duration):
+				results.append({"group":"fleet","name":name,"rtt":None,"sessions":n,"value":value,"unit":unit})
+	return results
+
+def compare(results,baseline,tolerance):
+	"results more than tolerance slower than baseline"
+	old={(r["group"],r["name"],r["rtt"],r["sessions"]):r["value"] for r in baseline["results"]}
+	return [dict(r,baseline=old[k]) for r in results
+		for k in [(r["group"],r["name"],r["rtt"],r["sessions"])] if k in old and r["value"]<old[k]*(1-tolerance)]
+
+def main(argv=None):
+	p=argparse.ArgumentParser(description="pyfanuc benchmarks against the local simulator")
+	p.add_argument("--rtt",default="0,0.001,0.005",help="simulated round trip times in seconds (comma separated)")
+	p.add_argument("--sessions",default="1,16",help="fleet sizes (comma separated)")
+	p.add_argument("--duration",type=float,default=1.0,help="seconds per measurement")
+	p.add_argument("--size",type=int,default=4000000,help="program size for transfers in bytes")
+	p.add_argument("--out",default="bench_output.txt",help="json result file, - for stdout")
+	p.add_argument("--baseline",help="json result file of an earlier run")
+	p.add_argument("--tolerance",type=float,default=0.2,help="allowed slowdown against baseline")
+	args=p.parse_args(argv)
+	results=run([float(x) for x in args.rtt.split(",")],[int(x) for x in args.sessions.split(",")],args.duration,args.size)
+	report={"time":time.strftime("%Y-%m-%dT%H:%M:%S"),"python":platform.python_version(),"numpy":_numpy() is not None,"results":results}
+	if args.baseline:
+		with open(args.baseline) as f:
+			report["regressions"]=compare(results,json.load(f),args.tolerance)
+	text=json.dumps(report,indent=1)
+	if args.out=="-":
+		print(text)
+	else:
+		with open(args.out,"w") as f:
+			f.write(text)
+	return 1 if report.get("regressions") else 0
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+import os,csv,math,time,numbers,threading
+from array import array
+try:
+	import pyarrow
+	import pyarrow.ipc
+	import pyarrow.parquet
+except ImportError:
+	pyarrow=None
+
+class columnwriter(object):
+	"""
+	Append poll results as rows (time, machine, signal, axis, value) to compact column buffers and flush them to a file
+	format: "csv", "parquet" or "arrow" (IPC file, parquet and arrow need pyarrow), default from the file extension
+	buffers are array('d') time/value, array('h') axis (0: no axis) and dictionary coded machine/signal (array('I')),
+	flushed after rows buffered rows or interval seconds (checked on append) and on close(),
+	csv is appended (header for new files), parquet writes one row group and arrow one record batch per flush,
+	nested results are flattened to signal names like "axes.ABS" or "param.1320" with the axis from list position
+	(or the "axis" of readparam/readdiag), values that are not numbers (names, text) and None are left out
+	use as fleetpoller callback (records with "error" are skipped) or call append() directly
+	"""
+	FORMATS={".csv":"csv",".parquet":"parquet",".arrow":"arrow",".feather":"arrow"}
+	def __init__(self,path,format=None,rows=1000000,interval=60):
+		self.path=path
+		self.format=format or self.FORMATS.get(os.path.splitext(path)[1].lower(),"csv")
+		if self.format!="csv" and pyarrow is None:
+			raise ImportError("pyarrow is required for %s output" % self.format)
+		self.rows=rows
+		self.interval=interval
+		self.machines={};self.signals={} #dictionaries value -> code
+		self.writer=None
+		self.written=0
+		self.lock=threading.Lock()
+		self._reset()
+	def __call__(self,record):
+		"append fleet record (machine, signal, time, value)"
+		if "error" not in record:
+			self.append(record["machine"],record["signal"],record["time"],record["value"])
+	def append(self,machine,signal,ts,value):
+		"append flattened value of signal read at ts (seconds since epoch) from machine"
+		with self.lock:
+			m=self._code(self.machines,machine)
+			for name,axis,v in self._flatten(signal,value,0):
+				self.time.append(ts)
+				self.machine.append(m)
+				self.signal.append(self._code(self.signals,name))
+				self.axis.append(axis)
+				self.value.append(v)
+			if len(self.value)>=self.rows or time.monotonic()-self.flushed>=self.interval:
+				self._flush()
+	def flush(self):
+		"write buffered rows"
+		with self.lock:
+			self._flush()
+	def close(self):
+		"flush and close file"
+		with self.lock:
+			self._flush()
+			if self.writer is not None:
+				self.writer.close()
+				self.writer=None
+	def __enter__(self):
+		return self
+	def __exit__(self,*exc):
+		self.close()
+	def __len__(self):
+		return len(self.value)
+
+	def _reset(self):
+		"intern function - new empty column buffers (flushed ones may still be referenced by arrow)"
+		self.time=array('d');self.machine=array('I');self.signal=array('I');self.axis=array('h');self.value=array('d')
+		self.flushed=time.monotonic()
+	def _code(self,dictionary,value):
+		"intern function - dictionary code of machine or signal"
+		c=dictionary.get(value)
+		if c is None:
+			c=dictionary[value]=len(dictionary)
+		return c
+	def _flatten(self,signal,value,axis):
+		"intern function - yield (signal,axis,value) of all numbers in value"
+		if value is None or isinstance(value,(str,bytes)):
+			return
+		if isinstance(value,numbers.Real):
+			yield signal,axis,float(value)
+		elif isinstance(value,dict):
+			if "data" in value and "axis" in value:
+				data=value["data"]
+				if data is None or isinstance(data,numbers.Real):
+					data=[data]
+				for i,v in enumerate(data):
+					yield from self._flatten(signal,v,value["axis"] if value["axis"]>0 else i+1 if len(data)>1 else 0)
+			else:
+				for k,v in value.items():
+					yield from self._flatten("%s.%s" % (signal,k),v,axis)
+		else:
+			try:
+				values=iter(value)
+			except TypeError:
+				return
+			for i,v in enumerate(values):
+				if not (isinstance(v,float) and math.isnan(v)):
+					yield from self._flatten(signal,v,i+1)
+	def _flush(self):
+		"intern function - write buffered rows (lock held)"
+		if not self.value:
+			self.flushed=time.monotonic()
+			return
+		if self.format=="csv":
+			self._writecsv()
+		else:
+			self._writearrow()
+		self.written+=len(self.value)
+		self._reset()
+	def _writecsv(self):
+		"intern function - append rows to csv file"
+		machines=list(self.machines);signals=list(self.signals)
+		new=not os.path.exists(self.path) or os.path.getsize(self.path)==0
+		with open(self.path,"a",newline="") as f:
+			w=csv.writer(f)
+			if new:
+				w.writerow(("time","machine","signal","axis","value"))
+			w.writerows((t,machines[m],signals[s],a or "",repr(v)) for t,m,s,a,v in
+				zip(self.time,self.machine,self.signal,self.axis,self.value))
+	def _writearrow(self):
+		"intern function - write columns as one parquet row group or arrow record batch"
+		n=len(self.value)
+		def column(type,buf):
+			return pyarrow.Array.from_buffers(type,n,[None,pyarrow.py_buffer(buf)])
+		def coded(buf,dictionary):
+			return pyarrow.array(list(dictionary),pyarrow.string()).take(column(pyarrow.uint32(),buf))
+		batch=pyarrow.RecordBatch.from_arrays([column(pyarrow.float64(),self.time),coded(self.machine,self.machines),
+			coded(self.signal,self.signals),column(pyarrow.int16(),self.axis),column(pyarrow.float64(),self.value)],
+			["time","machine","signal","axis","value"])
+		if self.format=="parquet":
+			table=pyarrow.Table.from_batches([batch])
+			if self.writer is None:
+				self.writer=pyarrow.parquet.ParquetWriter(self.path,table.schema)
+			self.writer.write_table(table)
+		else:
+			if self.writer is None:
+				self.writer=pyarrow.ipc.new_file(self.path,batch.schema)
+			self.writer.write_batch(batch)
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+import re
+from struct import Struct
+
+_TYPES={0:Struct(">B"),1:Struct(">H"),2:Struct(">I")}
+
+def _dec_snapshot(conn,st,snap):
+	"intern function - decoder of the snapshot request spec"
+	return snap._update(st)
+
+class pmcsnapshot(object):
+	"""
+	Snapshot of a PMC address map, e.g. pmcsnapshot(conn,["X0-127","Y0-127","R0-999",("D",0,3000)])
+	all areas are read byte-wise in as few frames as possible into one bytearray image per area,
+	poll() returns the bytes changed since the last poll as [(section,address,old,new)],
+	the first poll of a chunk only fills the image
+	query is a request spec and can be added to a batch,
+	template its prepared frames (await snap.template.execute(asyncconn) with AsyncFanuc)
+	"""
+	SECTIONS="GFYXARTKCD"
+	def __init__(self,conn,areas):
+		self.conn=conn
+		self.areas={}
+		self.images={}
+		self.chunks=[] #(section,offset,first,last)
+		for a in areas:
+			section,first,last=self._parse(a)
+			if section in self.areas:
+				raise ValueError("area %s defined twice" % section)
+			self.areas[section]=first
+			self.images[section]=bytearray(last-first+1)
+			n=max(1,conn.maxsubresp)
+			for f in range(first,last+1,n):
+				self.chunks.append((section,f-first,f,min(f+n-1,last)))
+		self.valid=[False]*len(self.chunks)
+		self.query=([conn._req_rdsub(2,1,0x8001,f,l,self.SECTIONS.index(s),0) for s,o,f,l in self.chunks],
+			_dec_snapshot,(self,),[l-f+1 for s,o,f,l in self.chunks])
+		self.template=conn.prepare(self.query)
+
+	def poll(self):
+		"read all areas, returns changed bytes [(section,address,old,new)]"
+		return self.template.execute(self.conn)
+	def bits(self,changes):
+		"changed bits of poll() result as [(section,address,bit,new)]"
+		ret=[]
+		for section,address,old,new in changes:
+			x=old^new
+			while x:
+				low=x&-x
+				bit=low.bit_length()-1
+				ret.append((section,address,bit,(new>>bit)&1))
+				x^=low
+		return ret
+	def value(self,section,address,datatype=0):
+		"value from image, datatype 0=byte,1=short,2=int32"
+		return _TYPES[datatype].unpack_from(self.images[section],address-self.areas[section])[0]
+	def bit(self,section,address,bit):
+		"bit from image"
+		return (self.images[section][address-self.areas[section]]>>bit)&1
+
+	def _parse(self,area):
+		"intern function - area as 'R0-999' or (section,first,last)"
+		if isinstance(area,str):
+			m=re.match(r"^([A-Z])(\d+)-(\d+)$",area.strip().upper())
+			if m is None:
+				raise ValueError("invalid area %s" % area)
+			area=(m.group(1),int(m.group(2)),int(m.group(3)))
+		section,first,last=area
+		if isinstance(section,int):
+			section=self.SECTIONS[section]
+		if section not in self.SECTIONS or last<first:
+			raise ValueError("invalid area %s" % (area,))
+		return section,first,last
+	def _update(self,st):
+		"intern function - copy answers into images and collect changed bytes"
+		changes=[]
+		for i,((section,offset,first,last),x) in enumerate(zip(self.chunks,st)):
+			n=last-first+1
+			if x["len"]<n:
+				self.valid[i]=False
+				continue
+			data=x["data"][0:n]
+			image=self.images[section]
+			if not self.valid[i]:
+				image[offset:offset+n]=data
+				self.valid[i]=True
+				continue
+			old=image[offset:offset+n]
+			if old==data:
+				continue
+			d=int.from_bytes(old,"big")^int.from_bytes(data,"big")
+			while d:
+				low=d&-d
+				pos=offset+n-1-(low.bit_length()-1)//8
+				changes.append((section,self.areas[section]+pos,image[pos],data[pos-offset]))
+				d&=~(0xff<<((n-1-pos+offset)*8))
+			image[offset:offset+n]=data
+		changes.sort()
+		return changes
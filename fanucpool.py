@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+import socket,time,threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pyfanuc import pyfanuc
+
+class fanucpool(object):
+	"""
+	Pool of handshaken sessions keyed by (ip,port,frame destination)
+	idle sessions are kept in LRU order, at most maxidle of them and not longer than idletime seconds,
+	sessions idle for more than checkafter seconds are health-checked with readalarm before reuse,
+	with a metadata cache (pyfanuccache) new sessions use connect(fast=True),
+	all sessions record into stats (pyfanucstats) if given
+	"""
+	RECONNECT=(socket.timeout,ConnectionError)
+	def __init__(self,maxidle=32,idletime=300,checkafter=30,cache=None,stats=None):
+		self.maxidle=maxidle
+		self.cache=cache
+		self.stats=stats
+		self.idletime=idletime
+		self.checkafter=checkafter
+		self.idle=OrderedDict() #session -> (key,released)
+		self.lock=threading.Lock()
+
+	def acquire(self,ip,port=8193,dst=pyfanuc.FRAME_DST):
+		"get idle session for (ip,port,dst) or connect a new one"
+		key=(ip,port,dst)
+		while True:
+			conn=None
+			with self.lock:
+				self._expire()
+				for c,(k,released) in reversed(self.idle.items()):
+					if k==key:
+						conn=c
+						del self.idle[c]
+						break
+			if conn is None:
+				return self._connect(key)
+			if time.monotonic()-released<self.checkafter or self._check(conn):
+				return conn
+			self._close(conn)
+			if self.stats is not None:
+				self.stats.reconnect(ip)
+	def release(self,conn):
+		"return session to the pool"
+		with self.lock:
+			self.idle[conn]=((conn.ip,conn.port,conn.dst),time.monotonic())
+			while len(self.idle)>self.maxidle:
+				self._close(self.idle.popitem(last=False)[0])
+	def discard(self,conn):
+		"close session instead of returning it"
+		self._close(conn)
+	@contextmanager
+	def session(self,ip,port=8193,dst=pyfanuc.FRAME_DST):
+		"""
+		context manager for a pooled session,
+		the session is discarded if the block raises a connection error
+		"""
+		conn=self.acquire(ip,port,dst)
+		try:
+			yield conn
+		except fanucpool.RECONNECT:
+			self.discard(conn)
+			raise
+		except BaseException:
+			self.release(conn)
+			raise
+		else:
+			self.release(conn)
+	def run(self,ip,fn,port=8193,dst=pyfanuc.FRAME_DST,retries=1):
+		"""
+		call fn(session) with a pooled session,
+		on socket.timeout/ConnectionResetError the session is replaced and fn is retried
+		"""
+		while True:
+			try:
+				with self.session(ip,port,dst) as conn:
+					return fn(conn)
+			except fanucpool.RECONNECT:
+				if retries<=0:
+					raise
+				retries-=1
+				if self.stats is not None:
+					self.stats.reconnect(ip)
+	def closeall(self):
+		"close all idle sessions"
+		with self.lock:
+			while self.idle:
+				self._close(self.idle.popitem()[0])
+
+	def _connect(self,key):
+		"intern function - connect new session"
+		conn=pyfanuc(key[0],key[1],self.cache,self.stats)
+		conn.dst=key[2]
+		try:
+			if conn.connect(self.cache is not None):
+				return conn
+		except Exception:
+			self._close(conn)
+			raise
+		self._close(conn)
+		raise ConnectionError("no OPN response from %s:%i" % key[0:2])
+	def _check(self,conn):
+		"intern function - cheap request to test session"
+		try:
+			return conn._req_rdsingle(1,1,0x1a)["len"]>=0
+		except OSError:
+			return False
+	def _expire(self):
+		"intern function - close sessions idle longer than idletime"
+		limit=time.monotonic()-self.idletime
+		while self.idle:
+			c,(k,released)=next(iter(self.idle.items()))
+			if released>=limit:
+				break
+			del self.idle[c]
+			self._close(c)
+	def _close(self,conn):
+		"intern function - close session"
+		try:
+			if conn.connected:
+				conn.disconnect()
+		except OSError:
+			pass
+		if conn.sock is not None:
+			conn.sock.close()
+		conn.connected=False
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+import socket,socketserver,threading,queue,time,re,math
+from struct import pack,unpack,Struct
+
+_HHH=Struct(">HHH");_SUB=Struct(">HHHiiiii");_IhH=Struct(">IhH")
+FRAMEHEAD=b'\xa0\xa0\xa0\xa0'
+
+class fanucsim(object):
+	"""
+	Local controller simulator speaking the FOCAS/Ethernet framing of pyfanuc
+	OPN/CLS, 21 01 multi requests, 15 01 program read (16 04 blocks, 17 01 end) and 11 01/12 04/13 01 program write
+	the state is plain attributes (sysinfo, statinfo, axisnames, positions, macros, pmc, params, diags, programs ...),
+	the defaults are the machine captured in sample_multipacket.md and sample_with_error.md
+	latency: seconds every response is delayed on its way to the client (delivered by a sender thread per connection,
+	the handler goes on reading, so pipelined requests overlap like on a network), fragment: bytes per send (0 whole frame),
+	errors: {(c1,c2,c3) or (c1,c2,c3,v1):error code} answered instead of the data,
+	stall: number of connections that stall at their next 21 01 request (it and all later ones are read but never answered)
+	"""
+	SAMPLEERRORS={(1,1,0x25):1,(1,1,0x26,7):6}
+	def __init__(self,host="127.0.0.1",port=0,latency=0,fragment=0,errors=None):
+		self.latency=latency
+		self.fragment=fragment
+		self.errors=dict(fanucsim.SAMPLEERRORS) if errors is None else errors
+		self.stall=0
+		self.delayed={} #socket -> (queue,sender thread) of connections with latency
+		self.sysinfo={"addinfo":0,"maxaxis":8,"cnctype":b"31","mttype":b" M","series":b"G421","version":b"08.0","axes":b"04"}
+		self.statinfo={"aut":1,"run":0,"motion":0,"mstb":0,"emegency":0,"alarm":0,"edit":0}
+		self.axisnames=["X","Y","Z","B"]
+		self.spindlenames=["S"]
+		self.positions={4:[311.1657,17.9202,0,0,-125,360,0,0],1:[-15.1363,-122.4431,-0.2131,-0.0099,-125,328.7623,0,0],
+			6:[149.5301,29.2875,-0.0414,0.4271,71.4087,-46814.2578,0,0],8:[0]*8,7:[0]*8}
+		self.decimals=4
+		self.servoload=[0,-0.0003,0.0033]+[0]*5
+		self.feed=0.0
+		self.spindlespeed=0.0
+		self.spindleload=0.0
+		self.alarm=0
+		self.alarms=[] #(code,type,axis,text)
+		self.prognum=(3000,3000)
+		self.seqnum=0
+		self.execblock=(0,"O3000")
+		self.clock=None #(Y,M,D,h,m,s), None for local time
+		self.macros={} #number:value, missing numbers are vacant
+		self.pmc={s:bytearray(10000) for s in range(10)}
+		self.params={20:(0,0,[4]),1320:(4,-1,[999.999]*8),6711:(3,0,[0])} #number:(type,axis,values)
+		self.diags={300:(3,-1,[0]*8),411:(3,-1,[0]*8)}
+		self.cwd="//CNC_MEM/USER/PATH1/"
+		self.folders={"//CNC_MEM/","//CNC_MEM/USER/","//CNC_MEM/USER/PATH1/","//CNC_MEM/USER/LIBRARY/"}
+		self.programs={self.cwd+"O3000":"%\nO3000(SAMPLE)\nG0 G90 X0 Y0\nM30\n%"}
+		self.mtimes={}
+		self.blocksize=0x500
+		self.frames=0
+		self.connections=0
+		self.uploads=[]
+		self.lock=threading.Lock()
+		sim=self
+		class handler(socketserver.BaseRequestHandler):
+			def handle(self):
+				sim._serve(self.request)
+		self.server=socketserver.ThreadingTCPServer((host,port),handler,bind_and_activate=False)
+		self.server.daemon_threads=True
+		self.server.allow_reuse_address=True
+		self.server.server_bind()
+		self.server.server_activate()
+		self.host,self.port=self.server.server_address[0:2]
+		self.thread=None
+
+	def start(self):
+		"serve in background thread"
+		self.thread=threading.Thread(target=self.server.serve_forever,args=(0.05,),name="fanucsim",daemon=True)
+		self.thread.start()
+		return self
+	def stop(self):
+		"stop serving"
+		self.server.shutdown()
+		self.server.server_close()
+		if self.thread is not None:
+			self.thread.join()
+	def __enter__(self):
+		return self.start()
+	def __exit__(self,*exc):
+		self.stop()
+
+	def _serve(self,sock):
+		"intern function - answer frames of one connection, then deliver the delayed responses"
+		try:
+			self._answer(sock)
+		except OSError:
+			pass
+		finally:
+			d=self.delayed.pop(sock,None)
+			if d is not None:
+				d[0].put(None)
+				d[1].join()
+	def _answer(self,sock):
+		"intern function - read and answer frames until the connection is closed"
+		sock.setsockopt(socket.IPPROTO_TCP,socket.TCP_NODELAY,1)
+		with self.lock:
+			self.connections+=1
+		folder=None
+		upload=bytearray()
+		stalled=False
+		while True:
+			head=self._recv(sock,10)
+			if head is None or head[0:4]!=FRAMEHEAD:
+				return
+			fvers,ftype,flen=_HHH.unpack_from(head,4)
+			data=self._recv(sock,flen)
+			if data is None:
+				return
+			with self.lock:
+				self.frames+=1
+			if ftype==0x0101:
+				self._send(sock,self._frame(0x0102,b''))
+			elif ftype==0x0201:
+				self._send(sock,self._frame(0x0202,b''))
+				return
+			elif ftype==0x2101:
+				with self.lock:
+					if not stalled and self.stall>0:
+						self.stall-=1
+						stalled=True
+				if not stalled:
+					self._send(sock,self._frame(0x2102,self._multi(data)))
+			elif ftype==0x1501:
+				self._send(sock,self._frame(0x1502,b''))
+				self._sendprog(sock,bytes(data[4:]).split(b'\0',1)[0].decode())
+			elif ftype==0x1101:
+				folder=bytes(data[4:]).split(b'\0',1)[0].decode()
+				if folder.startswith("N:"):
+					folder=folder[2:]
+				upload=bytearray()
+				self._send(sock,self._frame(0x1102,b''))
+			elif ftype==0x1204:
+				upload+=data
+			elif ftype==0x1301:
+				self._send(sock,self._frame(*self._store(folder,bytes(upload).decode())))
+			elif ftype==0x1702:
+				pass
+	def _recv(self,sock,n):
+		"intern function - receive n bytes, None on closed connection"
+		buf=bytearray()
+		while len(buf)<n:
+			try:
+				r=sock.recv(n-len(buf))
+			except OSError:
+				return None
+			if not r:
+				return None
+			buf+=r
+		return buf
+	def _frame(self,ftype,payload):
+		"intern function - response frame"
+		return FRAMEHEAD+_HHH.pack(2,ftype,len(payload))+payload
+	def _send(self,sock,frame):
+		"intern function - send now or, with latency, queue for the sender thread of the connection"
+		d=self.delayed.get(sock)
+		if d is None and self.latency:
+			d=self.delayed[sock]=(queue.Queue(),threading.Thread(target=self._sender,args=(sock,),name="fanucsim sender",daemon=True))
+			d[1].start()
+		if d is None:
+			self._write(sock,frame)
+		else:
+			d[0].put((time.monotonic()+self.latency,frame))
+	def _sender(self,sock):
+		"intern function - deliver queued responses of one connection in order when they are due"
+		q=self.delayed[sock][0]
+		while True:
+			item=q.get()
+			if item is None:
+				return
+			delay=item[0]-time.monotonic()
+			if delay>0:
+				time.sleep(delay)
+			try:
+				self._write(sock,item[1])
+			except OSError:
+				return
+	def _write(self,sock,frame):
+		"intern function - send frame in pieces of fragment bytes"
+		if not self.fragment:
+			sock.sendall(frame)
+			return
+		for pos in range(0,len(frame),self.fragment):
+			sock.sendall(frame[pos:pos+self.fragment])
+
+	def _multi(self,data):
+		"intern function - answer all subpackets of a 21 01 request"
+		count=unpack(">H",data[0:2])[0]
+		pos=2;out=[pack(">H",count)]
+		for t in range(count):
+			n=unpack(">H",data[pos:pos+2])[0]
+			sub=bytes(data[pos+2:pos+n])
+			pos+=n
+			cmd=sub[0:6]
+			c1,c2,c3,v1,v2,v3,v4,v5=_SUB.unpack_from(sub,0)
+			err=self.errors.get((c1,c2,c3,v1),self.errors.get((c1,c2,c3)))
+			if err is None:
+				with self.lock:
+					payload=self._command(c1,c2,c3,v1,v2,v3,v4,v5,sub[26:])
+				if payload is None:
+					err=1
+			if err is None:
+				r=cmd+b'\0'*6+pack(">H",len(payload))+payload
+			else:
+				r=cmd+pack(">h",err)+b'\0'*6
+			out.append(pack(">H",len(r)+2)+r)
+		return b''.join(out)
+	def _val8(self,v,decimals=None):
+		"intern function - 8 byte value (value,fill,base,fill,exponent), vacant for None"
+		if v is None or (isinstance(v,float) and math.isnan(v)):
+			return pack(">iBBBB",0,0,10,0xff,0xff)
+		if decimals is None:
+			decimals=self.decimals
+		return pack(">iBBBB",int(round(v*10**decimals)),0,10,0,decimals)
+	def _record(self,number,param):
+		"intern function - parameter/diagnostic record"
+		type,axis,values=param
+		out=[_IhH.pack(number,axis,type)]
+		for v in (values+[0]*self.sysinfo["maxaxis"])[0:self.sysinfo["maxaxis"]]:
+			if type in (0,1):
+				out.append(b'\0'*7+pack(">B",v))
+			elif type==2:
+				out.append(b'\0'*6+pack(">h",v))
+			else:
+				out.append(self._val8(v,0 if isinstance(v,int) else self.decimals))
+		return b''.join(out)
+	def _entry(self,path,folder):
+		"intern function - 128 byte directory record"
+		name=path[len(folder):].rstrip("/")
+		if path.endswith("/"):
+			return pack(">h12s6sII36s52s12s",0,b'\0'*12,b'',0,0,name.encode(),b'',b'')
+		text=self.programs[path]
+		comment=re.search(r"\((.*?)\)",text)
+		return pack(">h12s6sII36s52s12s",1,pack(">6H",*self.mtimes.get(path,(2020,5,14,12,15,5))),b'',len(text.encode()),0,
+			name.encode(),comment.group(1).encode() if comment else b'',b'')
+	def _listdir(self,folder):
+		"intern function - folders and programs of folder"
+		subs=sorted(f for f in self.folders if f.startswith(folder) and f!=folder and "/" not in f[len(folder):-1])
+		return subs+sorted(p for p in self.programs if p.startswith(folder) and "/" not in p[len(folder):])
+	def _command(self,c1,c2,c3,v1,v2,v3,v4,v5,pl):
+		"intern function - payload for one request subpacket, None for unknown command"
+		if c1==2 and c3==0x8001:
+			return bytes(self.pmc[v3][v1:v2+1])
+		if c1!=1:
+			return None
+		if c3==0x18:
+			s=self.sysinfo
+			return pack(">HH2s2s4s4s2s",s["addinfo"],s["maxaxis"],s["cnctype"],s["mttype"],s["series"],s["version"],s["axes"])
+		if c3==0x19:
+			return pack(">7H",*self.statinfo.values())
+		if c3==0x1a:
+			return pack(">L",self.alarm)
+		if c3==0x1c:
+			return pack(">ii",*self.prognum)
+		if c3==0x1d:
+			return pack(">i",self.seqnum)
+		if c3==0x20:
+			return pack(">i",self.execblock[0])+self.execblock[1].encode()[0:v1]
+		if c3==0x23:
+			return b''.join(pack(">iiii",a[0],a[1],a[2],len(a[3]))+a[3].encode()[0:v4].ljust(v4,b'\0') for a in self.alarms[0:v2])
+		if c3==0x24:
+			return self._val8(self.feed)
+		if c3==0x25:
+			return self._val8(self.spindlespeed)
+		if c3==0x40:
+			return self._val8(self.spindleload)
+		if c3==0x26:
+			values=self.positions.get(v1)
+			if values is None:
+				return None
+			values=values if v2==-1 else values[v2-1:v2]
+			return b''.join(self._val8(v) for v in values)
+		if c3==0x56:
+			return b''.join(self._val8(v) for v in self.servoload)
+		if c3==0x15:
+			return b''.join(self._val8(self.macros.get(n)) for n in range(v1,max(v1,v2)+1))
+		if c3==0xa7:
+			return b''.join(pack(">d",math.nan if self.macros.get(n) is None else self.macros[n]) for n in range(v1,max(v1,v2)+1))
+		if c3 in (0x8d,0x93):
+			table=self.params if c3==0x8d else self.diags
+			return b''.join(self._record(n,table[n]) for n in range(v1,max(v1,v2)+1) if n in table)
+		if c3==0x45:
+			t=self.clock or time.localtime()[0:6]
+			return pack(">6H",*t)
+		if c3==0x46:
+			return b''
+		if c3==0x89:
+			return b''.join(n.encode()[0:4].ljust(4,b'\0') for n in self.axisnames)
+		if c3==0x8a:
+			return b''.join(n.encode()[0:4].ljust(4,b'\0') for n in self.spindlenames)
+		if c3==0xa4 and v1 in (0,1):
+			return pack(">h",len(self.axisnames) if v1==0 else len(self.spindlenames))
+		if c3==0x06:
+			progs=sorted((int(p[len(self.cwd)+1:]),p) for p in self.programs if re.match(r"^O\d+$",p[len(self.cwd):]))
+			return b''.join(pack(">II64s",n,len(self.programs[p].encode()),b'') for n,p in progs if n>=v1)[0:v2*72]
+		path=pl.split(b'\0',1)[0].decode()
+		if c3==0xb0:
+			return self.cwd.encode().ljust(256,b'\0')
+		if c3==0xb9:
+			return ("%sO%04i" % (self.cwd,self.prognum[1])).encode().ljust(256,b'\0')
+		if c3==0xb4:
+			if path not in self.folders:
+				return None
+			entries=self._listdir(path)
+			dirs=sum(1 for e in entries if e.endswith("/"))
+			return pack(">ii",dirs,len(entries)-dirs)
+		if c3==0xb3:
+			if path not in self.folders:
+				return None
+			return b''.join(self._entry(e,path) for e in self._listdir(path)[v1:v1+v2])
+		if c3==0xb6:
+			if path not in self.programs:
+				return None
+			del self.programs[path]
+			return b''
+		return None
+
+	def _sendprog(self,sock,request):
+		"intern function - program read, 16 04 blocks and 17 01"
+		name=request.split("-",1)[0]
+		with self.lock:
+			text=self.programs.get(name if name.startswith("//") else self.cwd+name)
+		data=b'' if text is None else text.encode()
+		frames=[self._frame(0x1604,data[pos:pos+self.blocksize]) for pos in range(0,len(data),self.blocksize)] or [self._frame(0x1604,b'')]
+		for f in frames:
+			self._send(sock,f)
+		self._send(sock,self._frame(0x1701,b''))
+	def _store(self,folder,text):
+		"intern function - store uploaded program, returns response frame type and payload"
+		m=re.search(r"^\s*%?\s*(O\d+|<[^>]+>)",text)
+		if folder not in self.folders or m is None:
+			return 0x1404,pack(">HHH",0x2006,0x0005,0x0001)
+		name=m.group(1).strip("<>")
+		with self.lock:
+			if folder+name in self.programs:
+				return 0x1404,pack(">HHH",0x2006,0x0005,0x0004)
+			self.programs[folder+name]=text
+			self.mtimes[folder+name]=time.localtime()[0:6]
+			self.uploads.append(folder+name)
+		return 0x1302,b''
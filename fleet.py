@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+import time,threading,queue
+from concurrent.futures import ThreadPoolExecutor
+from pyfanuc import pyfanuc
+
+class fleetpoller(object):
+	"""
+	Poll many machines with persistent sessions on a bounded thread pool
+	machines: list of ip or (ip,port)
+	schedule: {signal:(interval,getter,args)}, e.g.
+		{"axes":(0.1,"readaxes",(pyfanuc.ABS,)),"alarm":(1,"readalarm",()),"progs":(600,"listprog",())}
+	signals due at the same time on one machine are sent as one batch if the getter can be batched
+	results are dicts {"machine","signal","time","value"} (or "error" instead of "value"),
+	passed to callback or queued for results(),
+	with a metadata cache (pyfanuccache) reconnects use connect(fast=True),
+	all sessions record into stats (pyfanucstats) if given
+	"""
+	def __init__(self,machines,schedule,workers=16,callback=None,backoff=(1,60),cache=None,stats=None):
+		self.schedule=schedule
+		self.cache=cache
+		self.stats=stats
+		self.workers=workers
+		self.callback=callback
+		self.backoff=backoff
+		self.queue=queue.Queue()
+		self.machines=[]
+		for m in machines:
+			ip,port=(m,8193) if isinstance(m,str) else m
+			self.machines.append({"ip":ip,"port":port,"conn":None,"busy":False,"fails":0,"retry":0,"redial":False,
+				"due":dict.fromkeys(schedule,0)})
+		self.lock=threading.Lock()
+		self.wake=threading.Event()
+		self.running=False
+		self.thread=None
+		self.pool=None
+
+	def start(self):
+		"start scheduler thread and worker pool"
+		self.running=True
+		now=time.monotonic()
+		for m in self.machines:
+			m["due"]=dict.fromkeys(self.schedule,now)
+		self.pool=ThreadPoolExecutor(max_workers=self.workers)
+		self.thread=threading.Thread(target=self._run,name="fleetpoller",daemon=True)
+		self.thread.start()
+	def stop(self):
+		"stop polling and disconnect all sessions"
+		self.running=False
+		self.wake.set()
+		if self.thread is not None:
+			self.thread.join()
+		if self.pool is not None:
+			self.pool.shutdown(wait=True)
+		for m in self.machines:
+			self._drop(m,True)
+	def __enter__(self):
+		self.start()
+		return self
+	def __exit__(self,*exc):
+		self.stop()
+	def results(self,timeout=None):
+		"iterate queued results (without callback), ends after timeout seconds without result"
+		while True:
+			try:
+				yield self.queue.get(timeout=timeout)
+			except queue.Empty:
+				return
+
+	def _run(self):
+		"intern function - scheduler loop, submits due signals per idle machine"
+		while self.running:
+			now=time.monotonic()
+			wait=1.0
+			with self.lock:
+				for m in self.machines:
+					if m["busy"]:
+						continue
+					if m["retry"]>now:
+						wait=min(wait,m["retry"]-now)
+						continue
+					due=[s for s,t in m["due"].items() if t<=now]
+					if due:
+						m["busy"]=True
+						self.pool.submit(self._poll,m,due)
+					else:
+						wait=min(wait,min(m["due"].values())-now)
+			self.wake.wait(max(wait,0.001))
+			self.wake.clear()
+	def _poll(self,m,due):
+		"intern function - read due signals of one machine"
+		try:
+			if m["conn"] is None:
+				conn=pyfanuc(m["ip"],m["port"],self.cache,self.stats)
+				try:
+					if not conn.connect(self.cache is not None):
+						raise ConnectionError("no OPN response")
+				except Exception:
+					if conn.sock is not None:
+						conn.sock.close()
+					raise
+				m["conn"]=conn
+				if m["redial"]:
+					m["redial"]=False
+					if self.stats is not None:
+						self.stats.reconnect(m["ip"])
+			conn=m["conn"]
+			b=conn.batch()
+			idx={}
+			for s in due:
+				interval,name,args=self.schedule[s]
+				if hasattr(conn,"_q_"+name):
+					idx[s]=getattr(b,name)(*args)
+			r=b.execute() if idx else []
+			ts=time.time()
+			for s in due:
+				interval,name,args=self.schedule[s]
+				if s in idx:
+					value=r[idx[s]]
+				else:
+					value=getattr(conn,name)(*args)
+					ts=time.time()
+				self._emit({"machine":m["ip"],"signal":s,"time":ts,"value":value})
+			m["fails"]=0
+		except Exception as e:
+			m["redial"]=m["redial"] or m["conn"] is not None
+			self._drop(m)
+			m["fails"]+=1
+			m["retry"]=time.monotonic()+min(self.backoff[1],self.backoff[0]*2**(m["fails"]-1))
+			self._emit({"machine":m["ip"],"signal":None,"time":time.time(),"error":e})
+		finally:
+			now=time.monotonic()
+			with self.lock:
+				for s in due:
+					m["due"][s]=max(m["due"][s]+self.schedule[s][0],now)
+				m["busy"]=False
+			self.wake.set()
+	def _emit(self,record):
+		"intern function - pass result to callback or queue"
+		if self.callback is not None:
+			self.callback(record)
+		else:
+			self.queue.put(record)
+	def _drop(self,m,graceful=False):
+		"intern function - close session of machine"
+		conn,m["conn"]=m["conn"],None
+		if conn is not None:
+			try:
+				if graceful:
+					conn.disconnect()
+				conn.sock.close()
+			except OSError:
+				pass
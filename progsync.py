@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+import os,time,json,hashlib
+from transfer import transfermanager
+
+class progsync(object):
+	"""
+	Incremental program sync between controllers and a local folder root/<ip>/<path>/<name>
+	the index (json file) keeps machine, path, name, size, mtime and sha1 of every synced program,
+	pull() downloads only programs whose size or mtime in readdir_complete (listprog without path) changed,
+	push() uploads only local files whose hash changed (replaced programs are deleted first),
+	programs removed on the controller stay in the index without size and mtime and are not pushed back
+	"""
+	def __init__(self,index,root,sessions=2,retries=2):
+		self.path=index
+		self.root=root
+		self.sessions=sessions
+		self.retries=retries
+		self.index={}
+		if os.path.exists(index):
+			with open(index) as f:
+				for r in json.load(f):
+					self.index[(r["machine"],r["path"],r["name"])]=r
+
+	def pull(self,conn,path=None):
+		"""
+		download new or changed programs of path (listprog if None)
+		returns {"manifest","skipped","removed"}
+		"""
+		remote=self._list(conn,path)
+		todo={}
+		for name,(size,mtime) in remote.items():
+			r=self.index.get((conn.ip,path or "",name))
+			if r is None or r["size"]!=size or r["mtime"]!=mtime or not os.path.exists(self._local(conn.ip,path,name)):
+				todo[name]=(size,mtime)
+		removed=[k[2] for k,r in self.index.items() if k[0]==conn.ip and k[1]==(path or "") and k[2] not in remote and r["size"] is not None]
+		for name in removed:
+			r=self.index[(conn.ip,path or "",name)]
+			r["size"]=r["mtime"]=None
+		tm=self._manager()
+		for name in todo:
+			local=self._local(conn.ip,path,name)
+			os.makedirs(os.path.dirname(local),exist_ok=True)
+			tm.download((conn.ip,conn.port),int(name[1:]) if path is None else path+name,local)
+		manifest=tm.run()
+		for rec in manifest:
+			name=rec["name"][len(path):] if path is not None else "O%04i" % rec["name"]
+			if "error" not in rec:
+				self._record(conn.ip,path,name,*todo[name])
+		self.save()
+		return {"manifest":manifest,"skipped":len(remote)-len(todo),"removed":removed}
+	def push(self,conn,path):
+		"""
+		upload new or changed local programs of path (folder, e.g. "//CNC_MEM/USER/PATH1/")
+		returns {"manifest","skipped"}
+		"""
+		folder=self._local(conn.ip,path,"")
+		names=sorted(n for n in os.listdir(folder) if os.path.isfile(os.path.join(folder,n))) if os.path.isdir(folder) else []
+		todo=[n for n in names if self._changed(conn.ip,path,n)]
+		remote=self._list(conn,path) if todo else {}
+		tm=self._manager()
+		for name in todo:
+			if name in remote:
+				tm.delete((conn.ip,conn.port),path+name)
+		manifest=tm.run()
+		failed={r["name"][len(path):] for r in manifest if "error" in r}
+		tm=self._manager()
+		for name in todo:
+			if name not in failed:
+				tm.upload((conn.ip,conn.port),path,self._local(conn.ip,path,name))
+		uploads=tm.run()
+		manifest+=uploads
+		if uploads:
+			remote=self._list(conn,path)
+			for rec in uploads:
+				name=os.path.basename(rec["local"])
+				if "error" not in rec:
+					self._record(conn.ip,path,name,*remote.get(name,(None,None)))
+		self.save()
+		return {"manifest":manifest,"skipped":len(names)-len(todo)}
+	def save(self):
+		"write index (atomic replace)"
+		tmp=self.path+".tmp"
+		with open(tmp,"w") as f:
+			json.dump(list(self.index.values()),f,indent=1)
+		os.replace(tmp,self.path)
+
+	def _manager(self):
+		"intern function - transfer manager for one sync step"
+		return transfermanager(sessions=self.sessions,retries=self.retries)
+	def _list(self,conn,path):
+		"intern function - remote programs as {name:(size,mtime)}"
+		if path is None:
+			progs=conn.listprog()
+			if progs is None:
+				raise ConnectionError("listprog failed on %s" % conn.ip)
+			return {"O%04i" % n:(p["size"],None) for n,p in progs.items()}
+		ret={}
+		for e in conn.readdir_complete(path):
+			if e["type"]=="F":
+				ret[e["name"]]=(e["size"],time.strftime("%Y-%m-%d %H:%M:%S",e["datetime"]))
+		return ret
+	def _local(self,ip,path,name):
+		"intern function - local file of program"
+		return os.path.join(self.root,ip,*[p for p in (path or "").split("/") if p],name)
+	def _hash(self,file):
+		"intern function - sha1 of local file"
+		h=hashlib.sha1()
+		with open(file,"rb") as f:
+			for block in iter(lambda:f.read(0x10000),b""):
+				h.update(block)
+		return h.hexdigest()
+	def _changed(self,ip,path,name):
+		"intern function - local file differs from index"
+		r=self.index.get((ip,path,name))
+		return r is None or r["hash"]!=self._hash(self._local(ip,path,name))
+	def _record(self,ip,path,name,size,mtime):
+		"intern function - update index entry from local file"
+		self.index[(ip,path or "",name)]={"machine":ip,"path":path or "","name":name,"size":size,"mtime":mtime,
+			"hash":self._hash(self._local(ip,path,name))}
@@ -3,15 +3,50 @@
 #0.11 extend to multipacket
 #0.12 readaxis
 import socket,time,datetime
-from struct import pack,unpack
-import re
+from struct import pack,unpack,Struct
+import re,os,sys,json,math,codecs,threading,bisect,logging,tempfile
+from array import array
+
+log=logging.getLogger(__name__) #diagnostic output, silent unless the application configures logging
+log.addHandler(logging.NullHandler())
+
+#precompiled structs for the codec
+_H=Struct(">H");_h=Struct(">h");_i=Struct(">i");_I=Struct(">I")
+_HH=Struct(">HH");_HHH=Struct(">HHH");_IhH=Struct(">IhH")
+_SUB=Struct(">HHHiiiii")
+_VAL8=Struct(">ixBH") #int32 value,fill,base,(fill,exponent) - ffff for no value
+_DIRENT=Struct(">h6H6xII36s52s12x") #type,datetime,fill,size,attr,name,comment,proctimestamp
+numpy=None #optional, imported by _numpy() on the first vectorized decode
+_VAL8DTYPE=None
+_NUMPYLOADED=False
+
+def _numpy():
+	"intern function - import numpy on first use, returns the module or None if it is not installed"
+	global numpy,_VAL8DTYPE,_NUMPYLOADED
+	if not _NUMPYLOADED:
+		_NUMPYLOADED=True
+		try:
+			import numpy as np
+		except ImportError:
+			return None
+		_VAL8DTYPE=np.dtype([("value",">i4"),("fill","u1"),("base","u1"),("none","u1"),("exp","u1")])
+		numpy=np
+	return numpy
 
 class pyfanuc(object):
-	def __init__(self, ip, port=8193):
+	def __init__(self, ip, port=8193, cache=None, stats=None):
 		self.sock=None
 		self.ip=ip
 		self.port=port
 		self.connected=False
+		self.maxframe=0x5b4 #max. request length per frame
+		self.maxresp=0x2000 #max. expected response length per frame for planned bulk reads
+		self.maxsubresp=0x5b4 #max. expected response length per subpacket for planned bulk reads
+		self.window=1 #frames in flight, >1 pipelines multi-frame requests
+		self.dst=pyfanuc.FRAME_DST
+		self.cache=cache #metadata store with get(ip)/put(ip,meta), e.g. pyfanuccache
+		self.revalidate=False
+		self.stats=stats #request statistics registry, e.g. pyfanucstats (None: disabled)
 	FTYPE_OPN_REQU=0x0101;FTYPE_OPN_RESP=0x0102
 	FTYPE_VAR_REQU=0x2101;FTYPE_VAR_RESP=0x2102
 	FTYPE_CLS_REQU=0x0201;FTYPE_CLS_RESP=0x0202
@@ -19,24 +54,22 @@ class pyfanuc(object):
 	FRAME_DST=b'\x00\x02';FRAME_DST2=b'\x00\x01'
 	FRAMEHEAD=b'\xa0\xa0\xa0\xa0'
 	
-	def connect(self):
-		"Establish connection to machine and set parameters with sysinfo"
+	def connect(self,fast=False):
+		"""
+		Establish connection to machine and set parameters with sysinfo
+		fast=True takes sysinfo and axis metadata from cache (one round trip),
+		they are revalidated with the first request
+		"""
 		# try:
-		print('cnning1')
-		self.sock=socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-		self.sock.settimeout(5)
-		print('cnning2')
-		self.sock.connect((self.ip,self.port))
-		self.sock.settimeout(5)
-		print('cnning3')
-		self.sock.sendall(self._encap(pyfanuc.FTYPE_OPN_REQU,pyfanuc.FRAME_DST))
-		print('cnning4')
-		data=self._decap(self.sock.recv(1500))
-		if data["ftype"]==pyfanuc.FTYPE_OPN_RESP:
+		if self._handshake():
 			self.connected=True
-			self.getsysinfo()
-			self.getstatinfo()
-			print('cnn ok')
+			meta=self.cache.get(self.ip) if fast and self.cache is not None else None
+			if meta:
+				self._setmeta(meta)
+				self.revalidate=True
+			else:
+				self._loadmeta()
+			log.debug("connected to %s:%i",self.ip,self.port)
 		# except Exception as e:
 		# 	# self.sock.shutdown(2)
 		# 	self.sock.close()
@@ -53,13 +86,58 @@ class pyfanuc(object):
 #		self.sock=None
 #		self.connected=False
 		return self.connected
+	def _handshake(self):
+		"intern function - open socket and send OPN request"
+		log.debug("open %s:%i",self.ip,self.port)
+		self.sock=socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+		self.sock.settimeout(5)
+		self.sock.connect((self.ip,self.port))
+		self.sock.settimeout(5)
+		self.sock.sendall(self._encap(pyfanuc.FTYPE_OPN_REQU,self.dst))
+		data=self._decap(self._recvframe())
+		log.debug("OPN response from %s:%i: %s",self.ip,self.port,data)
+		if self.stats is not None and data.get("ftype")==pyfanuc.FTYPE_OPN_RESP:
+			self.stats.connect(self.ip)
+		return data.get("ftype")==pyfanuc.FTYPE_OPN_RESP
+	def _loadmeta(self):
+		"intern function - read sysinfo/statinfo (and axis metadata for the cache) in one frame"
+		q=[self._q_getsysinfo(),self._q_getstatinfo()]
+		if self.cache is not None:
+			q+=[self._q_readaxisnames(),self._q_readspindlenames(),self._q_readaxiscount()]
+		self._queries(q)
+		if self.cache is not None and getattr(self,"sysinfo",None):
+			self.cache.put(self.ip,self._getmeta())
+	def _getmeta(self):
+		"intern function - metadata as JSON-compatible dict"
+		return {"sysinfo":{k:v.decode("latin-1") if isinstance(v,bytes) else v for k,v in self.sysinfo.items()},
+			"axisnames":self.axisnames,"spindlenames":self.spindlenames,"axiscount":self.axiscount}
+	def _setmeta(self,meta):
+		"intern function - restore metadata from _getmeta"
+		self.sysinfo={k:v.encode("latin-1") if isinstance(v,str) else v for k,v in meta["sysinfo"].items()}
+		self.axisnames=meta.get("axisnames")
+		self.spindlenames=meta.get("spindlenames")
+		self.axiscount=meta.get("axiscount")
+	def _q_revalidate(self):
+		return self._q_getsysinfo()[0]+self._q_getstatinfo()[0],pyfanuc._dec_revalidate,()
+	def _dec_revalidate(self,st):
+		"intern function - compare sysinfo with the cached one, returns True if it changed (metadata is reloaded then)"
+		old=self.sysinfo
+		if self._dec_getsysinfo(st[0:1]) is None:
+			self.sysinfo=old
+			return
+		self._dec_getstatinfo(st[1:2])
+		if self.sysinfo!=old:
+			self.axisnames=self.spindlenames=self.axiscount=None
+			if self.cache is not None:
+				self.cache.put(self.ip,None)
+			return True
 	def disconnect(self):
 		try:
 			self.sock.settimeout(1)
 			"Disconnect the connection to the machine"
 			if self.connected:
 				self.sock.sendall(self._encap(pyfanuc.FTYPE_CLS_REQU,b''))
-				data=self._decap(self.sock.recv(1500))
+				data=self._decap(self._recvframe())
 				if data["ftype"]==pyfanuc.FTYPE_CLS_RESP:
 					return True
 				self.sock.shutdown(2)
@@ -68,7 +146,7 @@ class pyfanuc(object):
 			self.sock.shutdown(2)
 			self.sock.close()
 			self.connected=False
-			print(e)
+			log.warning("disconnect from %s:%i failed: %s",self.ip,self.port,e)
 
 		finally:
 			# time.sleep(2)
@@ -219,101 +297,292 @@ class pyfanuc(object):
 			pre=[]
 			if isinstance(payload,list):
 				for t in payload:
-					pre.append(pack(">H",len(t)+2)+t)
-				payload=pack(">H",len(pre))+b''.join(pre)
+					pre.append(_H.pack(len(t)+2)+t)
+				payload=_H.pack(len(pre))+b''.join(pre)
 			else:
-				payload=pack(">HH",1,len(payload)+2)+payload
+				payload=_HH.pack(1,len(payload)+2)+payload
 		# print(pyfanuc.FRAMEHEAD.hex()+pack(">HHH",fvers,ftype,len(payload)).hex()+payload.hex())
 		# self._show_requsts(pyfanuc.FRAMEHEAD.hex()+pack(">HHH",fvers,ftype,len(payload)).hex()+payload.hex())
-		return pyfanuc.FRAMEHEAD+pack(">HHH",fvers,ftype,len(payload))+payload
+		return pyfanuc.FRAMEHEAD+_HHH.pack(fvers,ftype,len(payload))+payload
 	def _decap(self,data):
 		# self._show_response(data.hex())
-		"intern function - Decapsulate packetdata"
+		"""
+		intern function - Decapsulate packetdata
+		data and subpackets are memoryviews of the received frame
+		"""
 		if len(data)<10:
 			return {"len":-1}
-		if not data.startswith(b'\xa0'*4):
+		if data[0:4]!=pyfanuc.FRAMEHEAD:
 			return {"len":-1}
-		fvers,ftype,len1=unpack(">HHH",data[4:10])
+		fvers,ftype,len1=_HHH.unpack_from(data,4)
 		if len1+10 != len(data):
 			return {"len":-1}
 		if len1==0:
 			return {"len":0,"ftype":ftype,"fvers":fvers,"data":b'0'}
-		data=data[10:]
+		data=memoryview(data)[10:]
 		if ftype==pyfanuc.FTYPE_VAR_RESP:
 			re=[]
-			qu=unpack(">H",data[0:2])[0]
+			qu=_H.unpack_from(data,0)[0]
 			n=2
 			for t in range(qu):
-				le=unpack(">H",data[n:n+2])[0]
+				le=_H.unpack_from(data,n)[0]
 				re.append(data[n+2:n+le])
 				n+=le
 			return {"len":len1,"ftype":ftype,"fvers":fvers,"data":re}
 		else: # ftype==FTYPE_OPN_RESP or ftype==FTYPE_CLS_RESP
 			return {"len":len1,"ftype":ftype,"fvers":fvers,"data":data}
+	def _recvexact(self,sock,view):
+		"intern function - fill view completely from sock"
+		n=0
+		while n<len(view):
+			r=sock.recv_into(view[n:])
+			if r==0:
+				raise ConnectionResetError("connection closed by controller")
+			n+=r
+	def _recvframe(self,sock=None):
+		"intern function - receive exactly one frame (header + announced length)"
+		if sock is None:
+			sock=self.sock
+		head=bytearray(10)
+		self._recvexact(sock,memoryview(head))
+		if head[0:4]!=pyfanuc.FRAMEHEAD:
+			return head
+		len1=_H.unpack_from(head,8)[0]
+		buf=bytearray(10+len1)
+		buf[0:10]=head
+		self._recvexact(sock,memoryview(buf)[10:])
+		return buf
 	def _req_rdsingle(self,c1,c2,c3,v1=0,v2=0,v3=0,v4=0,v5=0,pl=b""):
 		"intern function - pack simple command"
-		cmd=pack(">HHH",c1,c2,c3)
-		# print('cmd:',cmd)
-		self.sock.sendall(self._encap(pyfanuc.FTYPE_VAR_REQU,cmd+pack(">iiiii",v1,v2,v3,v4,v5)+pl))
-		t=self._decap(self.sock.recv(1500))
-		# print('t:',t)
-		if t["len"]==0:
-			return {"len":-1}
-		elif t["ftype"]!=pyfanuc.FTYPE_VAR_RESP:
-			return {"len":-1}
-		elif t["data"][0].startswith(cmd+b'\x00'*6):
-			return {"len":unpack(">H",t["data"][0][12:14])[0],"data":t["data"][0][14:]}
-		elif t["data"][0].startswith(cmd):
-			return {"len":0,"data":t["data"][0][6:],"error":unpack(">h",t["data"][0][6:8])[0]}
+		if self.revalidate:
+			self._queries([])
+		r=self._req_rdframe([self._req_rdsub(c1,c2,c3,v1,v2,v3,v4,v5)+pl])
+		return r[0] if r else {"len":-1}
+	def _req_rdframe(self,subs,data=None):
+		"intern function - send subpackets in one frame (data: already encapsulated), returns one result per subpacket"
+		if data is None:
+			data=self._encap(pyfanuc.FTYPE_VAR_REQU,subs)
+		if self.stats is not None:
+			return self._req_rdframestat(subs,data)
+		self.sock.sendall(data)
+		return self._req_split(subs,self._decap(self._recvframe()))
+	def _req_rdframestat(self,subs,data):
+		"intern function - _req_rdframe recording latency, bytes, results and timeouts into stats"
+		start=time.perf_counter()
+		try:
+			self.sock.sendall(data)
+			resp=self._recvframe()
+		except socket.timeout:
+			self.stats.timeout(self.ip,subs,time.perf_counter()-start)
+			raise
+		r=self._req_split(subs,self._decap(resp))
+		self.stats.frame(self.ip,subs,r,time.perf_counter()-start,len(data),len(resp))
+		return r
+	def _req_rdframes(self,frames,data=None):
+		"intern function - send frames lock-step or pipelined (window>1), returns results per frame"
+		return [r for f,r in self._req_iterframes(frames,data)]
+	def _req_iterframes(self,frames,data=None):
+		"intern function - send frames lock-step or pipelined (window>1), yields frame and results as they arrive"
+		if data is None:
+			data=[None]*len(frames)
+		if self.window<=1 or len(frames)<2:
+			for f,d in zip(frames,data):
+				yield f,self._req_rdframe(f,d)
 		else:
-			return {"len":-1}
-	def _req_rdmulti(self,l):
-		"intern function - pack multiple commands"
-		self.sock.sendall(self._encap(pyfanuc.FTYPE_VAR_REQU,l))
-		t=self._decap(self.sock.recv(1500))
-		if t["len"]==0:
-			return {"len":-1}
-		elif t["ftype"]!=pyfanuc.FTYPE_VAR_RESP:
-			return {"len":-1}
-		if len(l) != len(t["data"]):
-			return {"len":-1}
-		for x in range(len(t["data"])):
-			if t["data"][x][0:6] == l[x][0:6]:
-				if t["data"][x][6:12]==b'\x00'*6:
-					t["data"][x]=[0,t["data"][x][12:]]
-				else:
-					t["data"][x]=[unpack('>h',t["data"][x][0:2])[0],t["data"][x][12:]]
+			yield from self._req_pipeline(frames,data)
+	def _req_pipeline(self,frames,data):
+		"""
+		intern function - keep up to window frames in flight, yields frame and results in order
+		responses are matched in order by the echoed command of every subpacket,
+		if one is dropped, reordered or times out the session is reopened and the
+		remaining frames of this call are sent lock-step (window stays as it is),
+		responses still in flight when the caller stops early are read and dropped
+		"""
+		done=sent=0;failed=False
+		stats=self.stats;times=[]
+		try:
+			while done<len(frames):
+				while sent<len(frames) and sent-done<self.window:
+					d=self._encap(pyfanuc.FTYPE_VAR_REQU,frames[sent]) if data[sent] is None else data[sent]
+					if stats is not None:
+						times.append((time.perf_counter(),len(d)))
+					self.sock.sendall(d)
+					sent+=1
+				try:
+					resp=self._recvframe()
+				except socket.timeout:
+					if stats is not None:
+						stats.timeout(self.ip,frames[done],time.perf_counter()-times[done][0])
+					failed=True
+					break
+				r=self._req_split(frames[done],self._decap(resp))
+				if stats is not None:
+					stats.frame(self.ip,frames[done],r,time.perf_counter()-times[done][0],times[done][1],len(resp))
+				if r is None:
+					failed=True
+					break
+				done+=1
+				yield frames[done-1],r
+		except GeneratorExit:
+			for n in range(done,sent):
+				self._recvframe()
+			raise
+		if failed:
+			log.warning("pipelined response %i of %i from %s:%i failed, reopening session",done+1,len(frames),self.ip,self.port)
+			self.sock.close()
+			if stats is not None:
+				stats.reconnect(self.ip)
+			self._handshake()
+			for f,d in zip(frames[done:],data[done:]):
+				yield f,self._req_rdframe(f,d)
+	def _req_split(self,subs,t):
+		"intern function - split decapsulated response into results like _req_rdsingle"
+		if t["len"]<=0 or t["ftype"]!=pyfanuc.FTYPE_VAR_RESP or len(t["data"])!=len(subs):
+			return None
+		r=[]
+		for s,x in zip(subs,t["data"]):
+			if x[0:6]!=s[0:6]:
+				return None
+			if x[6:12]==b'\x00'*6:
+				r.append({"len":_H.unpack_from(x,12)[0],"data":x[14:]})
 			else:
-				return {"len":-1}
-		return t
+				r.append({"len":0,"data":x[6:],"error":_h.unpack_from(x,6)[0]})
+		return r
+	def _req_frames(self,subs,sizes=None):
+		"""
+		intern function - split subpackets into frames of at most maxframe bytes,
+		with the expected response length of every subpacket (sizes) also at most maxresp bytes per frame
+		"""
+		frames=[];n=m=0
+		for i,s in enumerate(subs):
+			rs=sizes[i]+16 if sizes else 0
+			if not frames or n+len(s)+2>self.maxframe or m+rs>self.maxresp:
+				frames.append([]);n=2;m=0
+			frames[-1].append(s)
+			n+=len(s)+2;m+=rs
+		return frames
+	def _req_plan(self,queries):
+		"intern function - split the subpackets of request specs into frames"
+		subs=[s for q in queries for s in q[0]]
+		if not any(len(q)>3 for q in queries):
+			return self._req_frames(subs)
+		return self._req_frames(subs,[n for q in queries for n in (q[3] if len(q)>3 else [0]*len(q[0]))])
+	def _queries(self,queries,plan=None):
+		"""
+		intern function - run request specs (subpackets,decoder,args[,expected response lengths])
+		coalesced into as few frames as possible (plan: frames and encapsulated frames of a template)
+		returns the decoded result of every spec
+		"""
+		if self.revalidate:
+			self.revalidate=False
+			ret=self._queries([self._q_revalidate()]+queries)
+			if ret[0]:
+				self._loadmeta()
+			return ret[1:]
+		frames,data=plan if plan is not None else (self._req_plan(queries),None)
+		st=[]
+		for f,r in zip(frames,self._req_rdframes(frames,data)):
+			st.extend(r if r else [{"len":-1}]*len(f))
+		ret=[];n=0
+		for q in queries:
+			ret.append(q[1](self,st[n:n+len(q[0])],*q[2]))
+			n+=len(q[0])
+		return ret
+	def _query(self,query):
+		"intern function - run single request spec"
+		return self._queries([query])[0]
+	def batch(self):
+		"""
+		Collect reads and send them together
+		returns pyfanucbatch, call the getters on it and then execute()
+		"""
+		return pyfanucbatch(self)
+	def prepare(self,name,*args):
+		"""
+		Prepare a read for repeated polls, frames are packed and encapsulated once
+		name: getter with request spec (args are its arguments) or request spec
+		returns pyfanuctemplate, execute(conn=None) runs it on this or any other session
+		"""
+		q=getattr(self,"_q_"+name)(*args) if isinstance(name,str) else name
+		return pyfanuctemplate(self,[q],True)
+	def _batch(self,queries):
+		"intern function - run collected reads of a batch"
+		return self._queries(queries)
+	def _template(self,t):
+		"intern function - run prepared template"
+		r=self._queries(t.queries,(t.frames,t.data))
+		return r[0] if t.single else r
 	def _req_rdsub(self,c1,c2,c3,v1=0,v2=0,v3=0,v4=0,v5=0):
 		"intern function - pack subfunction info"
-		return pack(">HHHiiiii",c1,c2,c3,v1,v2,v3,v4,v5)
-	def _decode8(self,val):
-		"intern function - decode value from 8 bytes"
-		if val[5]==2 or val[5]==10:
-			if val[-2:]==b'\xff'*2:
+		return _SUB.pack(c1,c2,c3,v1,v2,v3,v4,v5)
+	def _decode8(self,val,pos=0):
+		"intern function - decode value from 8 bytes at pos"
+		value,base,exp=_VAL8.unpack_from(val,pos)
+		if base==2 or base==10:
+			if exp==0xffff:
 				return None
 			else:
-				return unpack(">i",val[0:4])[0]/val[5]**val[7]
+				return value/base**(exp&0xff)
+	def _decode8array(self,val,pos=0,count=-1):
+		"""
+		intern function - decode count 8 byte values from pos in one operation
+		returns numpy float array (array('d') without numpy), NaN for no value
+		"""
+		if count<0:
+			count=(len(val)-pos)//8
+		if _numpy() is None:
+			return array('d',[math.nan if v is None else v for v in (self._decode8(val,n) for n in range(pos,pos+count*8,8))])
+		return self._decode8numpy(numpy.frombuffer(val,_VAL8DTYPE,count,pos))
+	def _decode8numpy(self,a):
+		"intern function - decode numpy array of _VAL8DTYPE"
+		with numpy.errstate(divide="ignore",invalid="ignore",over="ignore"):
+			r=a["value"]/a["base"].astype(numpy.float64)**a["exp"]
+		r[((a["none"]==0xff)&(a["exp"]==0xff))|((a["base"]!=2)&(a["base"]!=10))]=numpy.nan
+		return r
+	def _decode8list(self,val,pos=0,count=-1):
+		"intern function - decode count 8 byte values from pos, returns list with None for no value"
+		if count<0:
+			count=(len(val)-pos)//8
+		if _numpy() is None:
+			return [self._decode8(val,n) for n in range(pos,pos+count*8,8)]
+		return [None if v!=v else v for v in self._decode8array(val,pos,count).tolist()]
+	def _decode8rows(self,val,pos,count,stride,rows):
+		"""
+		intern function - decode records of stride bytes from pos ending with count 8 byte values
+		returns list of rows with None for no value (None without numpy)
+		"""
+		if _numpy() is None:
+			return None
+		rec=numpy.dtype([("head","V%i" % (stride-count*8)),("values",_VAL8DTYPE,(count,))])
+		r=self._decode8numpy(numpy.frombuffer(val,rec,rows,pos)["values"])
+		return [[None if v!=v else v for v in row] for row in r.tolist()]
 	def getstatinfo(self):
 		"""
 		Get state of machine
 		"""
-		st=self._req_rdsingle(1,1,0x19,0)
+		return self._query(self._q_getstatinfo())
+	def _q_getstatinfo(self):
+		return [self._req_rdsub(1,1,0x19,0)],pyfanuc._dec_getstatinfo,()
+	def _dec_getstatinfo(self,r):
+		st=r[0]
 		if (self.sysinfo["cnctype"]==b"16" or self.sysinfo["cnctype"]==b"31" or self.sysinfo["cnctype"]==b" 0") and st["len"]==0xe:
 		# 	return dict(zip(['aut','run','motion','mstb','emegency','alarm','edit'],
 		# 	unpack(">HHHHHHH",st["data"])))
 		# if st["len"]==0xe:
 			self.statinfo=dict(zip(['aut','run','motion','mstb','emegency','alarm','edit'],
 			unpack(">HHHHHHH",st["data"])))
+			return self.statinfo
 
 	def getdate(self):
 		"""
 		Get date
 		returns [YEAR,MONTH,DAY]
 		"""
-		st=self._req_rdsingle(1,1,0x45,0)
+		return self._query(self._q_getdate())
+	def _q_getdate(self):
+		return [self._req_rdsub(1,1,0x45,0)],pyfanuc._dec_getdate,()
+	def _dec_getdate(self,r):
+		st=r[0]
 		if st["len"]==0xc:
 			return unpack(">HHH",st["data"][0:6])
 	def gettime(self):
@@ -321,7 +590,11 @@ class pyfanuc(object):
 		Get time
 		returns [HOUR,MINUTE,SECOND]
 		"""
-		st=self._req_rdsingle(1,1,0x45,1)
+		return self._query(self._q_gettime())
+	def _q_gettime(self):
+		return [self._req_rdsub(1,1,0x45,1)],pyfanuc._dec_gettime,()
+	def _dec_gettime(self,r):
+		st=r[0]
 		if st["len"]==0xc:
 			return unpack(">HHH",st["data"][-6:])
 	def getdatetime(self):
@@ -329,49 +602,54 @@ class pyfanuc(object):
 		Get date and time
 		returns time.struct_time
 		"""
-		st=self._req_rdmulti([self._req_rdsub(1,1,0x45,0),self._req_rdsub(1,1,0x45,1)])
-		if st["len"]<0:
-			return
-		if len(st["data"]) != 2:
+		return self._query(self._q_getdatetime())
+	def _q_getdatetime(self):
+		return [self._req_rdsub(1,1,0x45,0),self._req_rdsub(1,1,0x45,1)],pyfanuc._dec_getdatetime,()
+	def _dec_getdatetime(self,st):
+		if len(st) != 2:
 			return
-		if st["data"][0][0]!=0 or st["data"][1][0]!=0:
-			return
-		if unpack(">H",st["data"][0][1][0:2])[0] == 0xc and unpack(">H",st["data"][1][1][0:2])[0] == 0xc:
-			return datetime.datetime(*unpack(">HHHHHH",st["data"][0][1][2:8]+st["data"][1][1][-6:])).timetuple()
+		if st[0]["len"] == 0xc and st[1]["len"] == 0xc:
+			return datetime.datetime(*_HHH.unpack_from(st[0]["data"],0)+_HHH.unpack_from(st[1]["data"],len(st[1]["data"])-6)).timetuple()
 	def getsysinfo(self):
 		"""
 		Get sysinfo
 		returns ['addinfo','maxaxis','cnctype','mttype','series','version','axes']
 		"""
-		st=self._req_rdsingle(1,1,0x18)
+		return self._query(self._q_getsysinfo())
+	def _q_getsysinfo(self):
+		return [self._req_rdsub(1,1,0x18)],pyfanuc._dec_getsysinfo,()
+	def _dec_getsysinfo(self,r):
+		st=r[0]
 		if st["len"]==0x12:
 			self.sysinfo=dict(zip(['addinfo','maxaxis','cnctype','mttype','series','version','axes'],
 			unpack(">HH2s2s4s4s2s",st["data"])))
+			return self.sysinfo
 
 
 
 
 	ABS=1;REL=2;REF=4;SKIP=8;DIST=16
 	ALLAXIS=-1
+	AXVALUES=(("ABS",ABS,4),("REL",REL,6),("REF",REF,1),("SKIP",SKIP,8),("DIST",DIST,7))
 	def readaxes(self,what=1,axis=ALLAXIS):
+		return self._query(self._q_readaxes(what,axis))
+	def _q_readaxes(self,what=1,axis=ALLAXIS):
 		r=[]
-		axvalues=(("ABS",pyfanuc.ABS,4),("REL",pyfanuc.REL,6),("REF",pyfanuc.REF,1),("SKIP",pyfanuc.SKIP,8),("DIST",pyfanuc.DIST,7))
-		for u,v,w in axvalues:
+		for u,v,w in pyfanuc.AXVALUES:
 			if what & v:
 				r.append(self._req_rdsub(1,1,0x26,w,axis))
-		st=self._req_rdmulti(r)
-		if st["len"]<0:
+		return r,pyfanuc._dec_readaxes,(what,)
+	def _dec_readaxes(self,st,what):
+		if any(x["len"]<0 for x in st):
 			return
 		r={}
-		for x in st["data"]:
+		for x in st:
 			ret1=[]
-			if x[0]!=0:
+			if "error" in x:
 				ret1=None
 			else:
-				for pos in range(2,unpack(">H",x[1][0:2])[0]+2,8):
-					value=x[1][pos:pos+8]
-					ret1.append(self._decode8(value))
-			for u,v,w in axvalues:
+				ret1=self._decode8list(x["data"],0,x["len"]//8)
+			for u,v,w in pyfanuc.AXVALUES:
 				if what & v:
 					r[u]=ret1
 					what &= ~v
@@ -379,24 +657,30 @@ class pyfanuc(object):
 		return r
 
 	def readparam2(self,axis,first,last=0):
+		return self._query(self._q_readparam2(axis,first,last))
+	def _q_readparam2(self,axis,first,last=0):
 		if last==0:last=first
-		st=self._req_rdsingle(1,1,0x8d,first,last,axis)
+		return [self._req_rdsub(1,1,0x8d,first,last,axis)],pyfanuc._dec_readparam2,()
+	def _dec_readparam2(self,r):
+		st=r[0]
 		if st["len"]<0:
 			return
 		r={}
-		for pos in range(0,st["len"],self.sysinfo["maxaxis"]*8+8):
-			varname,axiscount,valtype=unpack(">IhH",st["data"][pos:pos+8])
+		data=st["data"]
+		stride=self.sysinfo["maxaxis"]*8+8
+		reals=self._decode8rows(data,0,self.sysinfo["maxaxis"],stride,st["len"]//stride)
+		for i,pos in enumerate(range(0,st["len"],stride)):
+			varname,axiscount,valtype=_IhH.unpack_from(data,pos)
 			values={"type":valtype,"axis":axiscount,"data":[]}
-			for n in range(pos+8,pos+self.sysinfo["maxaxis"]*8+8,8):
-				value=st["data"][n:n+8]
+			for k,n in enumerate(range(pos+8,pos+stride,8)):
 				if valtype==0:
-					value=value[-1] #bit 1bit / Byte
+					value=data[n+7] #bit 1bit / Byte
 				elif valtype==1:
-					value=[(value[-1] >> n)& 1 for n in range(7,-1,-1)] #bit 8bit
+					value=[(data[n+7] >> b)& 1 for b in range(7,-1,-1)] #bit 8bit
 				elif valtype==2:
-					value=unpack(">h",value[-2])[0] #short
+					value=_h.unpack_from(data,n+6)[0] #short
 				elif valtype==3 or valtype==4:
-					value=self._decode8(value) #real/long
+					value=self._decode8(data,n) if reals is None else reals[i][k] #real/long
 				if axiscount != -1:
 					values["data"].append(value)
 					break
@@ -406,26 +690,29 @@ class pyfanuc(object):
 		return r
 
 	def readparam(self,axis,first,last=0):
+		return self._query(self._q_readparam(axis,first,last))
+	def _q_readparam(self,axis,first,last=0):
 		if last==0:last=first
-		# st=self._req_rdsingle(1,1,0x0e,first,last,axis)
-		st=self._req_rdsingle(1,1,0x8d,first,last,axis)
-		# print('st:',st)
+		# return [self._req_rdsub(1,1,0x0e,first,last,axis)],pyfanuc._dec_readparam,()
+		return [self._req_rdsub(1,1,0x8d,first,last,axis)],pyfanuc._dec_readparam,()
+	def _dec_readparam(self,r):
+		st=r[0]
 		if st["len"]<0:
 			return
 		r={}
+		data=st["data"]
 		for pos in range(0,st["len"],self.sysinfo["maxaxis"]*4+8):
-			varname,axiscount,valtype=unpack(">IhH",st["data"][pos:pos+8])
+			varname,axiscount,valtype=_IhH.unpack_from(data,pos)
 			values={"type":valtype,"axis":axiscount,"data":[]}
 			for n in range(pos+8,pos+self.sysinfo["maxaxis"]*4+8,4):
-				value=st["data"][n:n+4]
 				if valtype==0:
-					value=value[-1] #bit 1bit / Byte
+					value=data[n+3] #bit 1bit / Byte
 				elif valtype==1:
-					value=[(value[-1] >> n)& 1 for n in range(7,-1,-1)] #bit 8bit
+					value=[(data[n+3] >> b)& 1 for b in range(7,-1,-1)] #bit 8bit
 				elif valtype==2:
-					value=unpack(">h",value[-2])[0] #short
+					value=_h.unpack_from(data,n+2)[0] #short
 				elif valtype==3:
-					value=unpack(">i",value)[0] #int
+					value=_i.unpack_from(data,n)[0] #int
 				if axiscount != -1:
 					values["data"].append(value)
 					break
@@ -434,7 +721,11 @@ class pyfanuc(object):
 			r[varname]=values
 		return r
 	def readdiag(self,axis,first,last=0):
-		# if last==0:last=first
+		return self._query(self._q_readdiag(axis,first,last))
+	def _q_readdiag(self,axis,first,last=0):
+		if last==0:last=first
+		return [self._req_rdsub(1,1,0x93,first,last,axis)],pyfanuc._dec_readdiag,()
+	def _dec_readdiag(self,r):
 		# st=self._req_rdsingle(1,1,0x30,first,last,axis)
 		# if st["len"]<0:
 		# 	return
@@ -459,26 +750,27 @@ class pyfanuc(object):
 		# 			values["data"].append(value)
 		# 	r[varname]=values
 		# return r
-		if last==0:last=first
-		st=self._req_rdsingle(1,1,0x93,first,last,axis)
+		st=r[0]
 		if st["len"]<0:
 			return
 		r={}
-		for pos in range(0,st["len"],self.sysinfo["maxaxis"]*8+8):
-			varname,axiscount,valtype=unpack(">IhH",st["data"][pos:pos+8])
+		data=st["data"]
+		stride=self.sysinfo["maxaxis"]*8+8
+		reals=self._decode8rows(data,0,self.sysinfo["maxaxis"],stride,st["len"]//stride)
+		for i,pos in enumerate(range(0,st["len"],stride)):
+			varname,axiscount,valtype=_IhH.unpack_from(data,pos)
 			values={"type":valtype,"axis":axiscount,"data":[]}
-			for n in range(pos+8,pos+self.sysinfo["maxaxis"]*8+8,8):
-				value=st["data"][n:n+8]
+			for k,n in enumerate(range(pos+8,pos+stride,8)):
 				if valtype==0:
-					value=value[-1] #bit 1bit / Byte
+					value=data[n+7] #bit 1bit / Byte
 				elif valtype==1:
-					value=[(value[-1] >> n)& 1 for n in range(7,-1,-1)] #bit 8bit
+					value=[(data[n+7] >> b)& 1 for b in range(7,-1,-1)] #bit 8bit
 				elif valtype==2:
 					# value=unpack(">h",value[-2])[0] #short
-					value=self._decode8(value) #real/long
+					value=self._decode8(data,n) #real/long
 					# value=value #short
 				elif valtype==3 or valtype==4:
-					value=self._decode8(value) #real/long
+					value=self._decode8(data,n) if reals is None else reals[i][k] #real/long
 				if axiscount != -1:
 					values["data"].append(value)
 					break
@@ -487,94 +779,159 @@ class pyfanuc(object):
 			r[varname]=values
 		return r
 
+	def iterparam(self,first=0,last=0,axis=ALLAXIS,numbers=None,diag=False):
+		"""
+		Read parameters (or diagnostics with diag=True) in bulk
+		requests range first..last or the list numbers, chunks are planned from maxaxis,
+		maxsubresp and maxresp and coalesced into multi-subpacket frames
+		yields (number,{"type","axis","data"}) as the frames arrive,
+		raises Exception with the number range of a frame or subpacket the controller does not answer
+		"""
+		frames,dec,numbers=self._iterparam_plan(first,last,axis,numbers,diag)
+		for f,r in self._req_iterframes(frames):
+			for k,v in self._iterparam_frame(f,r,dec,numbers):
+				yield k,v
+	def _iterparam_plan(self,first,last,axis,numbers,diag):
+		"intern function - frames, decoder and number filter of iterparam"
+		recsize=self.sysinfo["maxaxis"]*8+8
+		n=max(1,self.maxsubresp//recsize)
+		if numbers is None:
+			if last==0:last=first
+			ranges=[(t,min(t+n-1,last)) for t in range(first,last+1,n)]
+		else:
+			numbers=set(numbers)
+			ranges=[]
+			for t in sorted(numbers):
+				if ranges and t-ranges[-1][0]<n:
+					ranges[-1]=(ranges[-1][0],t)
+				else:
+					ranges.append((t,t))
+		c3,dec=(0x93,pyfanuc._dec_readdiag) if diag else (0x8d,pyfanuc._dec_readparam2)
+		subs=[self._req_rdsub(1,1,c3,f,l,axis) for f,l in ranges]
+		return self._req_frames(subs,[(l-f+1)*recsize for f,l in ranges]),dec,numbers
+	def _iterparam_frame(self,f,r,dec,numbers):
+		"intern function - decoded parameters of one iterparam frame, raises on a failed frame or subpacket"
+		if r is None:
+			raise Exception("Read of %i-%i failed (no valid response)" % (_i.unpack_from(f[0],6)[0],_i.unpack_from(f[-1],10)[0]))
+		for s,st in zip(f,r):
+			if "error" in st:
+				raise Exception("Read of %i-%i failed, error=%i" % (_i.unpack_from(s,6)[0],_i.unpack_from(s,10)[0],st["error"]))
+			for k,v in (dec(self,[st]) or {}).items():
+				if numbers is None or k in numbers:
+					yield k,v
 	def readmacro(self,first,last=0):
+		return self._query(self._q_readmacro(first,last))
+	def _q_readmacro(self,first,last=0):
 		if last==0: last=first
+		# 為每個 macro 建立子請求
+		return [self._req_rdsub(1,1,0x15,n,n) for n in range(first,last+1)],pyfanuc._dec_readmacro,(first,)
+	def _dec_readmacro(self,st,first):
+		if len(st)==1 and st[0]["len"]<=0:
+			return
+		result={}
+		for x in st:
+			# 每個 macro 只有一個值
+			if x["len"]>=8:
+				result[first]=self._decode8(x["data"])
+			else:  # 有錯誤
+				result[first]=None
+			first+=1
+		return result
 
-		if first==last:
-			st=self._req_rdsingle(1,1,0x15,first,last)
-			# print('st:',st)
-			if st["len"]<=0:
-				return
-			# 單一查詢的結果處理
-			result={}
-			result[first] = self._decode8(st["data"][0:8])
-			return result
-		else:
-			r=[]
-			macro_nums = list(range(first, last + 1))
-			# 為每個 macro 建立子請求
-			for macro_num in macro_nums:
-				r.append(self._req_rdsub(1, 1, 0x15, macro_num, macro_num))
-			
-			# 發送多重請求
-			st = self._req_rdmulti(r)
-			# print('multi st:', st)
-
-			result = {}
-			for x in st["data"]:
-				if x[0] != 0:  # 有錯誤
-					print(f"Error reading macro {first}: error code {x[0]}")
-					result[first] = None
-				else:
-					# 參考 readaxes 的處理方式
-					# x[1] 是資料部分，格式類似 readaxes 中的處理
-					data_length = unpack(">H", x[1][0:2])[0]
-					
-					# 處理資料，從位置 2 開始，每 8 bytes 一個值
-					for pos in range(2, data_length + 2, 8):
-						if pos + 8 <= len(x[1]):
-							value = x[1][pos:pos+8]
-							result[first] = self._decode8(value)
-							break  # 每個 macro 只有一個值
-						else:
-							result[first] = None
-							break
-				first += 1
-			return result
-		# result={}
-		# for pos in range(0,st["len"],8):
-		# 	result[first]=self._decode8(st["data"][pos:pos+8])
-		# 	first+=1
-		# return result
+	def readmacros(self,first,last,double=False):
+		"""
+		Read macro variable range with contiguous ranges per subpacket
+		double=True uses 01,01,a7 (read macro double) for full precision
+		ranges the controller does not answer completely are read per variable (with a7 for double)
+		returns {number:value}, None for vacant variables
+		"""
+		result=self._query(self._q_readmacros(first,last,double))
+		missing=[n for n in range(first,last+1) if n not in result]
+		if missing:
+			q=[self._q_readmacros(n,n,double) for n in missing]
+			for n,v in zip(missing,self._queries(q)):
+				result[n]=v.get(n)
+		return result
+	def _q_readmacros(self,first,last,double=False):
+		n=max(1,self.maxsubresp//8)
+		ranges=[(t,min(t+n-1,last)) for t in range(first,last+1,n)]
+		return ([self._req_rdsub(1,1,0xa7 if double else 0x15,f,l) for f,l in ranges],pyfanuc._dec_readmacros,
+			(ranges,double),[(l-f+1)*8 for f,l in ranges])
+	def _dec_readmacros(self,st,ranges,double):
+		"""
+		ranges without complete answer are left out, vacant variables (NaN with a7) are None
+		"""
+		result={}
+		for (f,l),x in zip(ranges,st):
+			count=l-f+1
+			if x["len"]<count*8:
+				continue
+			if double:
+				values=array('d')
+				values.frombytes(x["data"][0:count*8])
+				if sys.byteorder=="little":
+					values.byteswap()
+				values=[None if v!=v else v for v in values.tolist()]
+			else:
+				values=self._decode8list(x["data"],0,count)
+			result.update(zip(range(f,l+1),values))
+		return result
 
 	def readpmc(self,datatype,section,first,count=1):
+		return self._query(self._q_readpmc(datatype,section,first,count))
+	def _q_readpmc(self,datatype,section,first,count=1):
 		last=first+(1<<datatype)*count-1
-		st=self._req_rdsingle(2,1,0x8001,first,last,section,datatype)
+		return [self._req_rdsub(2,1,0x8001,first,last,section,datatype)],pyfanuc._dec_readpmc,(datatype,first)
+	def _dec_readpmc(self,r,datatype,first):
+		st=r[0]
 		if st["len"]<=0:
 			return
 		r={}
+		data=st["data"]
 		for x in range(st["len"]>>datatype):
 			pos=(1<<datatype)*x
 			if datatype==0:
-				value=st["data"][pos]
+				value=data[pos]
 			elif datatype==1:
-				value=unpack(">H",st["data"][pos:pos+2])[0]
+				value=_H.unpack_from(data,pos)[0]
 			elif datatype==2:
-				value=unpack(">I",st["data"][pos:pos+4])[0]
+				value=_I.unpack_from(data,pos)[0]
 			r[first+(1<<datatype)*x]=value
 		return r
 	def readexecprog(self,chars=256):
-		st=self._req_rdsingle(1,1,0x20,chars)
+		return self._query(self._q_readexecprog(chars))
+	def _q_readexecprog(self,chars=256):
+		return [self._req_rdsub(1,1,0x20,chars)],pyfanuc._dec_readexecprog,()
+	def _dec_readexecprog(self,r):
+		st=r[0]
 		if st["len"]<=4:
 			return
-		return {"block":unpack(">i",st["data"][0:4])[0],"text":st["data"][4:].decode()}
+		return {"block":_i.unpack_from(st["data"],0)[0],"text":str(st["data"][4:],"utf-8")}
 	def readprognum(self):
 		"""
 		Get the running program and main program numbers
 		returns [running,main]
 		"""
-		st=self._req_rdsingle(1,1,0x1c)
+		return self._query(self._q_readprognum())
+	def _q_readprognum(self):
+		return [self._req_rdsub(1,1,0x1c)],pyfanuc._dec_readprognum,()
+	def _dec_readprognum(self,r):
+		st=r[0]
 		if st["len"]<8:
 			return
-		return {"run":unpack(">i",st["data"][0:4])[0],"main":unpack(">i",st["data"][4:])[0]}
+		return {"run":_i.unpack_from(st["data"],0)[0],"main":_i.unpack_from(st["data"],4)[0]}
 	def readprogname(self): #31i
 		"""
 		Get current mainprogname
 		returns name with path
 		"""
-		st=self._req_rdsingle(1,1,0xb9)
+		return self._query(self._q_readprogname())
+	def _q_readprogname(self):
+		return [self._req_rdsub(1,1,0xb9)],pyfanuc._dec_readprogname,()
+	def _dec_readprogname(self,r):
+		st=r[0]
 		if st["len"]>=0:
-			p=st["data"].split(b'\0', 1)[0]
+			p=bytes(st["data"]).split(b'\0', 1)[0]
 			return p.decode()
 		return None
 	def settime(self,h=-1,m=0,s=0):
@@ -587,7 +944,7 @@ class pyfanuc(object):
 			t=time.localtime()
 			h,m,s=t.tm_hour,t.tm_min,t.tm_sec
 		self.sock.sendall(self._encap(pyfanuc.FTYPE_VAR_REQU,self._req_rdsub(1,1,0x46,1,0,0,0,12)+b'\x00'*6+pack(">HHH",h,m,s)))
-		t=self._decap(self.sock.recv(1500))
+		t=self._decap(self._recvframe())
 		if t["len"]==18:
 			if t["ftype"]==pyfanuc.FTYPE_VAR_RESP and unpack(">HHH",t["data"][0][0:6])==(1,1,0x46):
 				return unpack(">h",t["data"][0][6:8])[0]
@@ -606,24 +963,32 @@ class pyfanuc(object):
 				ret[number]={"size":size,"comment":comment.decode()}
 	def readalarm(self):
 		"Read alarm Bitfield"
-		st=self._req_rdsingle(1,1,0x1a)
+		return self._query(self._q_readalarm())
+	def _q_readalarm(self):
+		return [self._req_rdsub(1,1,0x1a)],pyfanuc._dec_readalarm,()
+	def _dec_readalarm(self,r):
+		st=r[0]
 		if st["len"]==4:
 			return unpack(">L",st["data"])[0]
 		return None
 	def readalarmcode(self,type,withtext=0,maxmsgs=-1,textlength=32):
 		"Read alarm code / msg"
+		return self._query(self._q_readalarmcode(type,withtext,maxmsgs,textlength))
+	def _q_readalarmcode(self,type,withtext=0,maxmsgs=-1,textlength=32):
 		#readalarmmsg	Returns Alarmcode+Msgtext	1,1,0x23,int32 Type,int32 MaxMsgs,int32 0 w/o or 1/2 with text,int32 MaxTextLength
 		#											int32 AlarmCode,int32 AlarmType,int32 Axis,int32 TextLength,text/trash
 		if maxmsgs<=0:
 			maxmsgs=int(self.sysinfo['axes'])
-		st=self._req_rdsingle(1,1,0x23,type,maxmsgs,withtext,textlength)
+		return [self._req_rdsub(1,1,0x23,type,maxmsgs,withtext,textlength)],pyfanuc._dec_readalarmcode,(withtext,textlength)
+	def _dec_readalarmcode(self,r,withtext,textlength):
+		st=r[0]
 		ret=[]
 		if st["len"] > 0:
 			for pos in range(0,st["len"],4*4+textlength):
 				entry=dict(zip(['alarmcode','alarmtype','axis'],unpack(">iii",st["data"][pos:pos+4*3])))
 				txlen=unpack(">i",st["data"][pos+4*3:pos+4*4])[0]
 				if txlen>0 and withtext>0:
-					entry["text"]=st["data"][pos+4*4:pos+4*4+textlength]
+					entry["text"]=bytes(st["data"][pos+4*4:pos+4*4+textlength])
 				ret.append(entry)
 			return ret
 		return None
@@ -633,108 +998,206 @@ class pyfanuc(object):
 		requests 1 (default) for foreground or 2 for background
 		returns directoryname
 		"""
-		st=self._req_rdsingle(1,1,0xb0,fgbg)
-		if st["len"]>=0:
-			p=st["data"].split(b'\0', 1)[0]
-			return p.decode()
-		return None
+		return self._query(self._q_readdir_current(fgbg))
+	def _q_readdir_current(self,fgbg=1):
+		return [self._req_rdsub(1,1,0xb0,fgbg)],pyfanuc._dec_readprogname,()
 	def readdir_info(self,dir): #31i
+		return self._query(self._q_readdir_info(dir))
+	def _q_readdir_info(self,dir):
 		buffer=bytearray(0x100)
 		bdir=dir.encode()
 		buffer[0:len(bdir)]=bdir
-		st=self._req_rdsingle(1,1,0xb4,0,0,0,0,256,buffer)
+		return [self._req_rdsub(1,1,0xb4,0,0,0,0,256)+buffer],pyfanuc._dec_readdir_info,()
+	def _dec_readdir_info(self,r):
+		st=r[0]
 		if st["len"]>=8:
 			return dict(zip(['dirs','files'],unpack(">ii",st["data"])))
 		return None
 	def readdir(self,dir,first=0,count=10,type=0,size=1): #30i
+		return self._query(self._q_readdir(dir,first,count,type,size))
+	def _q_readdir(self,dir,first=0,count=10,type=0,size=1):
 		buffer=bytearray(0x100)
 		bdir=dir.encode()
 		buffer[0:len(bdir)]=bdir
-		st=self._req_rdsingle(1,1,0xb3,first,count,type,size,256,buffer)
+		return [self._req_rdsub(1,1,0xb3,first,count,type,size,256)+buffer],pyfanuc._dec_readdir,()
+	def _dec_readdir(self,r):
+		st=r[0]
 		x=[]
 		if st["len"]>=8:
-			for t in range(0,st["len"],128):
-				n=dict(zip(['type','datetime','unkn','size','attr','name','comment','proctimestamp'],unpack(">h12s6sII36s52s12s",st["data"][t:t+128])))
-				del n['unkn']
-				if n['type']==1:
-					n['comment']=n['comment'].split(b'\0', 1)[0].decode()
-					n['datetime']=datetime.datetime(*unpack(">HHHHHH",n['datetime'])).timetuple()
+			data=st["data"]
+			for t in range(0,st["len"]-127,128):
+				type,y,mo,d,h,mi,sec,size,attr,name,comment=_DIRENT.unpack_from(data,t)
+				if type==1:
+					n={'type':'F','datetime':datetime.datetime(y,mo,d,h,mi,sec).timetuple(),'size':size,'attr':attr,
+						'name':name.split(b'\0', 1)[0].decode(),'comment':comment.split(b'\0', 1)[0].decode()}
 				else:
-					n['comment']=None
-					n['size']=None
-					n['datetime']=None
-				n['name']=n['name'].split(b'\0', 1)[0].decode()
-				n['type']='D' if n['type']==0 else 'F'
+					n={'type':'D','datetime':None,'size':None,'attr':attr,'name':name.split(b'\0', 1)[0].decode(),'comment':None}
+				n['proctimestamp']=bytes(data[t+116:t+128])
 				x.append(n)
 			return(x)
 		return None
+	def iterdir(self,dir,recursive=False):
+		"""
+		Iterate directory entries lazily
+		pages have as many entries as fit in maxsubresp, the count (b4) is requested in the frame of the first page,
+		further pages are sent together (as many frames as window),
+		recursive walks subdirectories level by level with the requests of all folders batched,
+		entries then have 'path' (folder of the entry)
+		"""
+		n=max(1,self.maxsubresp//128)
+		step=max(1,self.maxresp//(n*128+16))*max(1,self.window)
+		dirs=[dir]
+		while dirs:
+			q=[]
+			for d in dirs:
+				q.append(self._q_readdir_info(d))
+				q.append(self._q_readdir(d,0,n)+([n*128],))
+			r=self._queries(q)
+			pages=[];subdirs=[]
+			for i,d in enumerate(dirs):
+				info=r[2*i]
+				if info is None:
+					continue
+				total=info['dirs']+info['files']
+				pages.extend((d,first,min(n,total-first)) for first in range(n,total,n))
+				for e in self._iterdir_page(d,r[2*i+1] or [],recursive,subdirs):
+					yield e
+			for t in range(0,len(pages),step):
+				part=pages[t:t+step]
+				r=self._queries([self._q_readdir(d,first,count)+([count*128],) for d,first,count in part])
+				for (d,first,count),x in zip(part,r):
+					for e in self._iterdir_page(d,x or [],recursive,subdirs):
+						yield e
+			dirs=subdirs if recursive else []
+	def _iterdir_page(self,dir,entries,recursive,subdirs):
+		"intern function - entries of one page, collects subdirectories"
+		if recursive:
+			for e in entries:
+				e['path']=dir
+				if e['type']=='D':
+					subdirs.append((dir if dir.endswith('/') else dir+'/')+e['name']+'/')
+		return entries
 	def readdir_complete(self,dir): #30i
-		t=self.readdir_info(dir)
-		n=t['dirs']+t['files']
-		ret=[]
-		for t in range(0,n,10):
-			x=self.readdir(dir,first=t,count=10)
-			if not x is None:
-				ret.extend(x)
-			else:
-				break
-		return ret
-	def getprog(self,name): #TEST Stream
+		return list(self.iterdir(dir))
+	def _opensock2(self):
+		"intern function - open program transfer socket and send OPN request"
+		sock=socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+		try:
+			sock.settimeout(5)
+			sock.connect((self.ip,self.port))
+			sock.settimeout(1)
+			sock.sendall(self._encap(pyfanuc.FTYPE_OPN_REQU,pyfanuc.FRAME_DST2))
+			self._decap(self._recvframe(sock))
+		except Exception:
+			sock.close()
+			raise
+		return sock
+	def _progname(self,name):
 		"""
-		Get program-file
-		requests filename
-		returns filecontent
+		intern function - program request for number (O1234-O1234), name in the current folder
+		or full path (//CNC_MEM/USER/LIBRARY/O1234, sent unchanged)
 		"""
-		q=b''
 		if isinstance(name,int):
-			q=("O%04i-O%04i" % (name,name)).encode()
+			return ("O%04i-O%04i" % (name,name)).encode()
 		elif isinstance(name,str):
+			if name.startswith("/"):
+				return name.encode()
 			name=name.upper()
-			if not name.startswith("O"):
+			if name[:1].isdigit():
 				name="O"+name
 			if name.find("-")==-1:
 				name=name+"-"+name
-			q=name.encode()
-		else:
-			return -1
+			return name.encode()
+		return None
+	def getprog(self,name,progress=None): #TEST Stream
+		"""
+		Get program-file
+		requests number, name or full path (//CNC_MEM/USER/PATH1/O1234)
+		returns filecontent
+		"""
+		f=[]
+		for chunk in self._iterprog(name,progress):
+			if chunk is None:
+				return -1
+			f.append(chunk)
+		return ''.join(f)
+	def iterprog(self,name,progress=None):
+		"""
+		Get program-file as stream
+		requests filename
+		yields decoded text chunks as the data frames arrive, progress(bytes) is called after every frame
+		"""
+		for chunk in self._iterprog(name,progress):
+			if chunk is None:
+				raise Exception("Invalid frame in program transfer")
+			yield chunk
+	def saveprog(self,name,file,progress=None):
+		"""
+		Write program-file to file (path or binary file object) as the data frames arrive
+		returns number of bytes written or -1
+		"""
+		if isinstance(file,(str,bytes,os.PathLike)):
+			with open(file,"wb") as fo:
+				return self.saveprog(name,fo,progress)
+		n=0
+		for chunk in self._iterprog(name,progress,True):
+			if chunk is None:
+				return -1
+			file.write(chunk)
+			n+=len(chunk)
+		return n
+	def _iterprog(self,name,progress=None,raw=False):
+		"""
+		intern function - program transfer on own socket with one reusable receive buffer
+		yields text chunks (raw: memoryviews valid until the next chunk), None on invalid frame
+		"""
+		q=self._progname(name)
+		if q is None:
+			yield None
+			return
 		buffer=bytearray(0x204)
-		self.sock2=socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-		self.sock2.connect((self.ip,self.port))
-		self.sock2.settimeout(1)
-		self.sock2.sendall(self._encap(pyfanuc.FTYPE_OPN_REQU,pyfanuc.FRAME_DST2))
-		data=self._decap(self.sock2.recv(1500))
 		buffer[0:4]=b'\x00\x00\x00\x01'
-		buffer[4:4+len(q)]=q #buffer[4:15]=b'\x4f\x30\x31\x30\x30\x2d\x4f\x30\x31\x30\x30'
-		self.sock2.sendall(self._encap(0x1501,buffer))
-		data=self._decap(self.sock2.recv(1500))
-		#print(data)
-		f=b''
-		n=b''
-		while True:
-			n+=self.sock2.recv(1500)
-			while len(n)>=10:
-				if n[:4]==pyfanuc.FRAMEHEAD:
-					fvers,ftype,flen=unpack(">HHH",n[4:10])
-					if len(n)<flen:
-						break
-					n=n[10:]
-					if ftype==0x1604: #a0 a0 a0 a0 00 02 16 04 05 00
-						f+=n[:flen]
-						n=n[flen:]
-					elif ftype==0x1701: #a0 a0 a0 a0 00 02 17 01 00 00
-						self.sock2.sendall(self._encap(0x1702,b'')) #a0 a0 a0 a0 00 01 17 02 00 00
-						return f.decode()
-				else:
-					return -1
-		return -1
+		buffer[4:4+len(q)]=q
+		dec=codecs.getincrementaldecoder("utf-8")()
+		buf=bytearray(10+0xffff)
+		view=memoryview(buf)
+		sock2=self._opensock2()
+		try:
+			sock2.sendall(self._encap(0x1501,buffer))
+			self._decap(self._recvframe(sock2))
+			n=0
+			while True:
+				self._recvexact(sock2,view[0:10])
+				if buf[0:4]!=pyfanuc.FRAMEHEAD:
+					yield None
+					return
+				ftype,flen=_HH.unpack_from(buf,6)
+				self._recvexact(sock2,view[10:10+flen])
+				if ftype==0x1604: #a0 a0 a0 a0 00 02 16 04 05 00
+					n+=flen
+					if flen>0:
+						yield view[10:10+flen] if raw else dec.decode(view[10:10+flen])
+					if progress is not None:
+						progress(n)
+				elif ftype==0x1701: #a0 a0 a0 a0 00 02 17 01 00 00
+					sock2.sendall(self._encap(0x1702,b'')) #a0 a0 a0 a0 00 01 17 02 00 00
+					if not raw:
+						rest=dec.decode(b'',True)
+						if rest:
+							yield rest
+					return
+		finally:
+			sock2.close()
 	
 	#added uploadprog function 2025-12-19
-	def uploadprog(self, fullpath, content):
+	def uploadprog(self, fullpath, content, progress=None, chunksize=0xF0, frames=32):
 		"""
 		Upload program-file to CNC (File I/O mode)
 		fullpath: FULL PATH of folder only, e.g. "//MEMCARD/" or "//CNC_MEM/USER/PATH1/"
 				(Do NOT include filename here)
-		content: program text including Oxxxx
+		content: program text including Oxxxx (str/bytes or iterable of str/bytes)
+		progress(bytes,bytes per second) is called after every send,
+		chunksize is the payload of one 12 04 frame, frames are packed into one send
 		"""
 
 		# --- 1. FULL PATH 自動補 N: ---
@@ -744,22 +1207,75 @@ class pyfanuc(object):
 		folder = "N:" + fullpath              # e.g. N://MEMCARD/
 		folder_bytes = folder.encode()
 
-		# --- 2. 建立 socket ---
-		self.sock2 = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-		self.sock2.connect((self.ip, self.port))
-		self.sock2.settimeout(1)
+		# --- 2./3. 建立 socket + Open Request ---
+		sock2 = self._opensock2()
+		try:
+			return self._uploadprog(sock2, folder_bytes, content, progress, chunksize, frames)
+		finally:
+			sock2.close()
 
-		# --- 3. Open Request ---
-		self.sock2.sendall(self._encap(pyfanuc.FTYPE_OPN_REQU, pyfanuc.FRAME_DST2))
-		data = self._decap(self.sock2.recv(1500))
+	def uploadfile(self, fullpath, file, progress=None, chunksize=0xF0, frames=32):
+		"""
+		Upload program-file from path or file object, read incrementally
+		see uploadprog
+		"""
+		if isinstance(file, (str, bytes, os.PathLike)):
+			with open(file, "rb") as fo:
+				return self.uploadfile(fullpath, fo, progress, chunksize, frames)
+		size = chunksize * frames
+		return self.uploadprog(fullpath, iter(lambda: file.read(size), file.read(0)), progress, chunksize, frames)
+
+	def _uploadchunks(self, content, chunksize):
+		"intern function - split str/bytes or iterable of str/bytes into payloads of chunksize"
+		if isinstance(content, (str, bytes, bytearray)):
+			content = [content]
+		buf = bytearray()
+		for block in content:
+			if isinstance(block, str):
+				block = block.encode()
+			if not buf and len(block) >= chunksize:
+				view = memoryview(block)
+				n = len(block) - len(block) % chunksize
+				for pos in range(0, n, chunksize):
+					yield view[pos:pos+chunksize]
+				buf += view[n:]
+				continue
+			buf += block
+			if len(buf) >= chunksize:
+				n = len(buf) - len(buf) % chunksize
+				for pos in range(0, n, chunksize):
+					yield bytes(buf[pos:pos+chunksize])
+				del buf[0:n]
+		if buf:
+			yield bytes(buf)
 
+	def _uploadframes(self, content, chunksize, frames):
+		"intern function - 12 04 frames of content packed frames at a time (the last with 13 01), yields (data,bytes sent)"
+		out = bytearray()
+		count = 0
+		sent = 0
+		for chunk in self._uploadchunks(content, chunksize):
+			out += pyfanuc.FRAMEHEAD
+			out += _HHH.pack(1, 0x1204, len(chunk))
+			out += chunk
+			sent += len(chunk)
+			count += 1
+			if count >= frames:
+				yield out, sent
+				out = bytearray()
+				count = 0
+		out += self._encap(0x1301, b'')
+		yield out, sent
+
+	def _uploadprog(self, sock2, folder_bytes, content, progress=None, chunksize=0xF0, frames=32):
+		"intern function - write program on opened sock2"
 		# --- 4. Write Program Request (0x1101) ---
 		buffer = bytearray(0x204)
 		buffer[0:4] = b'\x00\x00\x00\x01'
 		buffer[4:4+len(folder_bytes)] = folder_bytes
 
-		self.sock2.sendall(self._encap(0x1101, buffer))
-		data = self._decap(self.sock2.recv(1500))
+		sock2.sendall(self._encap(0x1101, buffer))
+		data = self._decap(self._recvframe(sock2))
 
 		# # --- CNC 回應錯誤 (1103) ---
 		# if not data:
@@ -769,26 +1285,24 @@ class pyfanuc(object):
 		# 	err = data[3:]
 		# 	raise Exception(f"CNC Error 1103 (Write Request Failed): {err}")
 
-		# --- 5. 分段送程式內容 (0x1204) ---
-		block = content.encode()
-		pos = 0
-		MAXLEN = 0xF0
-
-		while pos < len(block):
-			chunk = block[pos:pos+MAXLEN]
-			pos += MAXLEN
-			self.sock2.sendall(self._encap(0x1204, chunk))
-
-		# --- 6. Write End (0x1301) ---
-		self.sock2.sendall(self._encap(0x1301, b''))
+		# --- 5./6. 分段送程式內容 (0x1204), frames per sendall, Write End (0x1301) ---
+		start = time.monotonic()
+		for out, sent in self._uploadframes(content, chunksize, frames):
+			sock2.sendall(out)
+			if progress is not None:
+				progress(sent, sent / max(time.monotonic() - start, 1e-6))
 
 		# --- 7. CNC 回應 (1302 or 1404) ---
-		data = self._decap(self.sock2.recv(1500))
+		data = self._decap(self._recvframe(sock2))
+
+		log.debug("upload response from %s:%i: %s",self.ip,self.port,data)
+		return self._uploadresult(data)
 
-		if not data:
+	def _uploadresult(self, data):
+		"intern function - evaluate response after 1301 (Write End)"
+		if not data or data["len"] < 0:
 			raise Exception("CNC did not respond after 1301 (Write End).")
 
-		print('data after 1301:', data)
 		ftype = data["ftype"]
 
 		# 成功
@@ -811,7 +1325,7 @@ class pyfanuc(object):
 			)
 
 		# --- 未知回應 ---
-		raise Exception(f"Unexpected CNC response: {data}")
+		raise Exception(f"Unexpected CNC response: {dict(data,data=bytes(data['data']))}")
 	
 	def deleteprog(self, fullpath):
 		if not fullpath.startswith("//"):
@@ -842,70 +1356,65 @@ class pyfanuc(object):
 		:param chars: number of characters to read from the head
 		:return: string containing the head of the program
 		"""
-		q = b''
-		if isinstance(name, int):
-			q = ("O%04i-O%04i" % (name, name)).encode()
-		elif isinstance(name, str):
-			name = name.upper()
-			if not name.startswith("O"):
-				name = "O" + name
-			if name.find("-") == -1:
-				name = name + "-" + name
-			q = name.encode()
-		else:
-			return -1
-		buffer = bytearray(0x204)
-		self.sock2 = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-		self.sock2.connect((self.ip, self.port))
-		self.sock2.settimeout(1)
-		self.sock2.sendall(self._encap(pyfanuc.FTYPE_OPN_REQU, pyfanuc.FRAME_DST2))
-		data = self._decap(self.sock2.recv(1500))
-		buffer[0:4] = b'\x00\x00\x00\x01'
-		buffer[4:4 + len(q)] = q
-		self.sock2.sendall(self._encap(0x1501, buffer))
-		data = self._decap(self.sock2.recv(1500))
-		f = b''
-		n = b''
-		while len(f) < chars:
-			n += self.sock2.recv(1500)
-			while len(n) >= 10:
-				if n[:4] == pyfanuc.FRAMEHEAD:
-					fvers, ftype, flen = unpack(">HHH", n[4:10])
-					if len(n) < flen:
-						break
-					n = n[10:]
-					if ftype == 0x1604:
-						chunk = n[:flen]
-						need = chars - len(f)
-						f += chunk[:need]
-						n = n[flen:]
-						if len(f) >= chars:
-							self.sock2.close()
-							return f[:chars].decode(errors='ignore')
-					elif ftype == 0x1701:
-						self.sock2.sendall(self._encap(0x1702, b''))
-						self.sock2.close()
-						return f[:chars].decode(errors='ignore')
-				else:
-					self.sock2.close()
-					return -1
-		self.sock2.close()
-		return f[:chars].decode(errors='ignore')
+		f=bytearray()
+		for chunk in self._iterprog(name,raw=True):
+			if chunk is None:
+				return -1
+			f+=chunk[:chars-len(f)]
+			if len(f)>=chars:
+				break
+		return f.decode(errors='ignore')
 	
+	def readaxisnames(self):
+		"""
+		Get names of the controlled axes
+		returns list of names
+		"""
+		return self._query(self._q_readaxisnames())
+	def _q_readaxisnames(self):
+		return [self._req_rdsub(1,1,0x89)],pyfanuc._dec_names,("axisnames",)
+	def readspindlenames(self):
+		"""
+		Get names of the spindles
+		returns list of names
+		"""
+		return self._query(self._q_readspindlenames())
+	def _q_readspindlenames(self):
+		return [self._req_rdsub(1,1,0x8a)],pyfanuc._dec_names,("spindlenames",)
+	def _dec_names(self,r,attr):
+		st=r[0]
+		names=None
+		if st["len"]>0:
+			names=[bytes(st["data"][n:n+4]).split(b'\0',1)[0].decode() for n in range(0,st["len"],4)]
+		setattr(self,attr,names)
+		return names
+	def readaxiscount(self):
+		"""
+		Get number of controlled axes
+		"""
+		return self._query(self._q_readaxiscount())
+	def _q_readaxiscount(self):
+		return [self._req_rdsub(1,1,0xa4,0)],pyfanuc._dec_axiscount,()
+	def _dec_axiscount(self,r):
+		st=r[0]
+		self.axiscount=_h.unpack_from(st["data"],0)[0] if st["len"]>=2 else None
+		return self.axiscount
 	def readactfeed(self):
 		"""
 		Get actual feedrate
 		returns feedrate
 		"""
-		st=self._req_rdsingle(1,1,0x24)
-		return self._decode8(st['data']) if st['len']==8 else None
+		return self._query(self._q_readactfeed())
+	def _q_readactfeed(self):
+		return [self._req_rdsub(1,1,0x24)],pyfanuc._dec_value8,()
 	def readactspindlespeed(self):
 		"""
 		Get actual spindlespeed
 		returns spindlespeed
 		"""
-		st=self._req_rdsingle(1,1,0x25)
-		return self._decode8(st['data']) if st['len']==8 else None
+		return self._query(self._q_readactspindlespeed())
+	def _q_readactspindlespeed(self):
+		return [self._req_rdsub(1,1,0x25)],pyfanuc._dec_value8,()
 	
 	#01,01,40 Read act SpindleSpeed/-Load (acts2)
 	def readactspindleload(self):
@@ -913,16 +1422,183 @@ class pyfanuc(object):
 		Get actual spindleload
 		returns spindleload in percent
 		"""
-		st=self._req_rdsingle(1,1,0x40)
+		return self._query(self._q_readactspindleload())
+	def _q_readactspindleload(self):
+		return [self._req_rdsub(1,1,0x40)],pyfanuc._dec_value8,()
+	def _dec_value8(self,r):
+		st=r[0]
 		return self._decode8(st['data']) if st['len']==8 else None
 
+class pyfanucbatch(object):
+	"""
+	Collects reads of one session and sends them in as few frames as possible
+	every getter of pyfanuc with a request spec (_q_...) can be called here,
+	it returns the index of its result in the list returned by execute()
+	"""
+	def __init__(self,conn):
+		self.conn=conn
+		self.queries=[]
+	def __getattr__(self,name):
+		if name.startswith("_"):
+			raise AttributeError(name)
+		q=getattr(self.conn,"_q_"+name,None)
+		if q is None:
+			raise AttributeError("%s can not be batched" % name)
+		return lambda *args,**kw:self.add(q(*args,**kw))
+	def add(self,query):
+		"add request spec (subpackets,decoder,args), returns its index"
+		self.queries.append(query)
+		return len(self.queries)-1
+	def execute(self):
+		"send all collected reads, returns the decoded results in order of the calls"
+		return self.conn._batch(self.queries)
+	def prepare(self):
+		"prepare collected reads as template for repeated polls"
+		return pyfanuctemplate(self.conn,list(self.queries))
+
+class pyfanuctemplate(object):
+	"""
+	Prepared reads, subpackets split into frames and encapsulated once,
+	execute() sends the same bytes on every call and decodes with the decoders of the request specs
+	"""
+	def __init__(self,conn,queries,single=False):
+		self.conn=conn
+		self.queries=queries
+		self.single=single
+		self.frames=conn._req_plan(queries)
+		self.data=[conn._encap(pyfanuc.FTYPE_VAR_REQU,f) for f in self.frames]
+	def execute(self,conn=None):
+		"send prepared frames on conn (default the preparing session), returns result (list of results for batches)"
+		return (self.conn if conn is None else conn)._template(self)
+
+class pyfanuccache(object):
+	"""
+	Metadata store for connect(fast=True), one JSON file keyed by ip
+	thread-safe, one instance can be shared by the sessions of a fleetpoller or fanucpool
+	"""
+	def __init__(self,path):
+		self.path=path
+		self.data=None
+		self.lock=threading.Lock()
+	def get(self,ip):
+		with self.lock:
+			return self._load().get(ip)
+	def put(self,ip,meta):
+		with self.lock:
+			data=dict(self._load())
+			if meta is None:
+				data.pop(ip,None)
+			else:
+				data[ip]=meta
+			fd,tmp=tempfile.mkstemp(".tmp",os.path.basename(self.path)+".",os.path.dirname(os.path.abspath(self.path)))
+			try:
+				with os.fdopen(fd,"w") as f:
+					json.dump(data,f)
+				os.replace(tmp,self.path)
+			except BaseException:
+				os.unlink(tmp)
+				raise
+			self.data=data
+	def _load(self):
+		"intern function - read the file once (lock held)"
+		if self.data is None:
+			try:
+				with open(self.path) as f:
+					self.data=json.load(f)
+			except (OSError,ValueError):
+				self.data={}
+		return self.data
+
+class pyfanucstats(object):
+	"""
+	In-process registry of request statistics, shared by sessions created with pyfanuc(ip,stats=...)
+	per machine: frames, bytes sent/received, invalid responses, timeouts, connects (opened sessions)
+	and reconnects (sessions reopened to replace a failed one)
+	per machine and command (c1,c2,c3): frames, subpackets, latency histogram (LATENCY upper bounds in seconds,
+	one more bucket for slower frames) and total seconds of the frames it was sent in, response payload bytes
+	and controller error codes {error:count},
+	hooks are called with (ip,subs,results,seconds) after every frame (results None on invalid response or timeout)
+	"""
+	LATENCY=(0.001,0.002,0.005,0.01,0.02,0.05,0.1,0.2,0.5,1,2,5)
+	def __init__(self):
+		self.lock=threading.Lock()
+		self.hooks=[]
+		self.reset()
+	def reset(self):
+		"clear all counters"
+		with self.lock:
+			self.machines={}
+			self.commands={} #(ip,(c1,c2,c3)) -> counters
+	def frame(self,ip,subs,results,seconds,sent,received):
+		"record one request frame"
+		bucket=bisect.bisect_left(self.LATENCY,seconds)
+		with self.lock:
+			m=self._machine(ip)
+			m["frames"]+=1;m["sent"]+=sent;m["received"]+=received
+			if results is None:
+				m["invalid"]+=1
+			self._commands(ip,subs,results,seconds,bucket)
+		for h in self.hooks:
+			h(ip,subs,results,seconds)
+	def timeout(self,ip,subs,seconds):
+		"record request frame without response"
+		with self.lock:
+			self._machine(ip)["timeouts"]+=1
+			self._commands(ip,subs,None,seconds,len(self.LATENCY))
+		for h in self.hooks:
+			h(ip,subs,None,seconds)
+	def connect(self,ip):
+		"record opened session"
+		with self.lock:
+			self._machine(ip)["connects"]+=1
+	def reconnect(self,ip):
+		"record session reopened to replace a failed one (pipeline fallback, pool replacement, fleet redial)"
+		with self.lock:
+			self._machine(ip)["reconnects"]+=1
+	def snapshot(self):
+		"""
+		copy of all counters as {"machines":{ip:counters},"commands":[counters]},
+		commands with "machine" and "command" (c1,c2,c3), slowest (most total seconds) first
+		"""
+		with self.lock:
+			machines={ip:dict(m) for ip,m in self.machines.items()}
+			commands=[dict(c,machine=ip,command=cmd,histogram=list(c["histogram"]),errors=dict(c["errors"]))
+				for (ip,cmd),c in self.commands.items()]
+		commands.sort(key=lambda c:-c["seconds"])
+		return {"machines":machines,"commands":commands}
+
+	def _machine(self,ip):
+		"intern function - counters of machine"
+		m=self.machines.get(ip)
+		if m is None:
+			m=self.machines[ip]={"frames":0,"sent":0,"received":0,"invalid":0,"timeouts":0,"connects":0,"reconnects":0}
+		return m
+	def _commands(self,ip,subs,results,seconds,bucket):
+		"intern function - count subpackets of one frame per command"
+		seen=set()
+		for i,s in enumerate(subs):
+			cmd=_HHH.unpack_from(s)
+			c=self.commands.get((ip,cmd))
+			if c is None:
+				c=self.commands[(ip,cmd)]={"frames":0,"subpackets":0,"seconds":0.0,"max":0.0,
+					"histogram":[0]*(len(self.LATENCY)+1),"received":0,"errors":{}}
+			c["subpackets"]+=1
+			if cmd not in seen:
+				seen.add(cmd)
+				c["frames"]+=1;c["seconds"]+=seconds;c["histogram"][bucket]+=1
+				if seconds>c["max"]:
+					c["max"]=seconds
+			if results is not None:
+				x=results[i]
+				if "error" in x:
+					c["errors"][x["error"]]=c["errors"].get(x["error"],0)+1
+				else:
+					c["received"]+=x["len"]
+
 # D1870 remain-wirelength in m
 # D1874 wirelength complete
 # D2204 conductivity*48
 
-import locale
-#locale.setlocale(locale.LC_ALL, 'deu_deu')
-locale.setlocale(locale.LC_ALL, 'zh_TW.utf8')
 if __name__ == '__main__':
 	conn=pyfanuc('192.168.3.63')
 	if conn.connect():
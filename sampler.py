@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+import time,math,threading
+from array import array
+from pyfanuc import pyfanuc,_numpy
+
+class axissampler(object):
+	"""
+	Sample axis positions at a fixed rate into a ring buffer of [samples, position type, axis]
+	what: position types like readaxes (pyfanuc.ABS|pyfanuc.REL ...), types lists their names in buffer order
+	the 26 request frame is built once and sent unchanged every cycle,
+	values are decoded straight into the buffer (numpy float array or array('d') without numpy), NaN for no value,
+	every row is written twice (mirrored ring) so that window() is always a zero-copy view
+	"""
+	def __init__(self,conn,what=pyfanuc.ABS,axis=pyfanuc.ALLAXIS,samples=6000):
+		self.conn=conn
+		self.samples=samples
+		self.axes=conn.sysinfo["maxaxis"] if axis==pyfanuc.ALLAXIS else 1
+		self.types=[u for u,v,w in pyfanuc.AXVALUES if what & v]
+		subs,dec,args=conn._q_readaxes(what,axis)
+		self.subs=subs
+		self.frame=conn._encap(pyfanuc.FTYPE_VAR_REQU,subs)
+		self.row=len(self.types)*self.axes
+		self.numpy=numpy=_numpy()
+		if numpy is not None:
+			self.data=numpy.full((2*samples,len(self.types),self.axes),numpy.nan)
+			self.times=numpy.zeros(2*samples)
+		else:
+			self.data=array('d',[math.nan])*(2*samples*self.row)
+			self.times=array('d',[0.0])*(2*samples)
+		self.count=0
+		self.running=False
+		self.thread=None
+
+	def sample(self):
+		"read one sample into the buffer, returns False if the controller did not answer completely"
+		conn=self.conn
+		t=time.monotonic()
+		r=conn._req_rdframe(self.subs,self.frame)
+		pos=self.count%self.samples
+		ok=r is not None
+		for k in range(len(self.types)):
+			x=r[k] if r is not None else {"len":0}
+			n=min(x["len"]//8,self.axes) if "error" not in x else 0
+			ok=ok and n==self.axes
+			if self.numpy is not None:
+				row=self.data[pos,k]
+				row[:n]=conn._decode8array(x["data"],0,n) if n else row[:0]
+				row[n:]=self.numpy.nan
+				self.data[pos+self.samples,k]=row
+			else:
+				base=pos*self.row+k*self.axes
+				for i in range(self.axes):
+					v=conn._decode8(x["data"],i*8) if i<n else None
+					self.data[base+i]=math.nan if v is None else v
+				base+=self.samples*self.row
+				self.data[base:base+self.axes]=self.data[base-self.samples*self.row:base-self.samples*self.row+self.axes]
+		self.times[pos]=self.times[pos+self.samples]=t
+		self.count+=1
+		return ok
+	def run(self,rate,count=None):
+		"sample rate times per second (monotonic schedule, late cycles are skipped) until count samples or stop()"
+		if self.thread is None:
+			self.running=True
+		interval=1.0/rate
+		due=time.monotonic()
+		n=0
+		while self.running and (count is None or n<count):
+			self.sample()
+			n+=1
+			due+=interval
+			now=time.monotonic()
+			if due<now:
+				due=now
+			else:
+				time.sleep(due-now)
+		self.running=False
+	def start(self,rate):
+		"sample in background thread"
+		self.running=True
+		self.thread=threading.Thread(target=self.run,args=(rate,),name="axissampler",daemon=True)
+		self.thread.start()
+	def stop(self):
+		"stop background sampling"
+		self.running=False
+		if self.thread is not None:
+			self.thread.join()
+			self.thread=None
+	def window(self,n=None):
+		"""
+		last n samples (all buffered without n) oldest first as zero-copy views (times,values),
+		values shaped [n,position type,axis] with numpy, flat memoryview in that order without numpy
+		"""
+		n=min(self.count,self.samples) if n is None else min(n,self.count,self.samples)
+		end=self.count%self.samples+self.samples
+		if self.numpy is not None:
+			return self.times[end-n:end],self.data[end-n:end]
+		return memoryview(self.times)[end-n:end],memoryview(self.data)[(end-n)*self.row:end*self.row]
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+import numbers
+
+def _dec_subscription(conn,st,sub):
+	"intern function - decoder of the subscription request spec"
+	return sub._update(conn,st)
+
+def _within(old,new,deadband):
+	"intern function - new differs from old by at most deadband (numbers, lists and dicts of numbers)"
+	if isinstance(new,dict):
+		return isinstance(old,dict) and old.keys()==new.keys() and all(_within(old[k],new[k],deadband) for k in new)
+	if isinstance(new,numbers.Real) and isinstance(old,numbers.Real):
+		return abs(new-old)<=deadband
+	if isinstance(new,(str,bytes)) or not hasattr(new,"__len__"):
+		return old==new
+	return hasattr(old,"__len__") and len(old)==len(new) and all(_within(a,b,deadband) for a,b in zip(old,new))
+
+class subscription(object):
+	"""
+	Report by exception, e.g. subscription(conn,{"stat":("getstatinfo",()),"feed":("readactfeed",(),5)})
+	signals: {name:(getter,args[,deadband])}, all getters with request spec,
+	the reads are prepared once as one template, poll() compares the raw payload of every subpacket
+	with the last poll and decodes only signals whose bytes changed,
+	decoded values equal or within deadband of the last reported value (numbers, also inside lists and dicts) are not reported,
+	returns {name:value} of changed signals (the first poll reports all), values keeps the last reported values,
+	signals without complete answer are left out until they are answered again
+	query is a request spec and can be added to a batch,
+	template its prepared frames (await sub.template.execute(asyncconn) with AsyncFanuc)
+	"""
+	def __init__(self,conn,signals):
+		self.conn=conn
+		self.signals=[] #(name,first subpacket,subpackets,decoder,args,deadband)
+		self.values={}
+		subs=[];sizes=[];sized=False
+		for name,s in signals.items():
+			q=getattr(conn,"_q_"+s[0])(*s[1])
+			self.signals.append((name,len(subs),len(q[0]),q[1],q[2],s[2] if len(s)>2 else 0))
+			subs+=q[0]
+			sizes+=q[3] if len(q)>3 else [0]*len(q[0])
+			sized=sized or len(q)>3
+		self.raw=[None]*len(subs) #payload of the last poll per subpacket
+		self.errors=[False]*len(subs)
+		self.query=(subs,_dec_subscription,(self,),sizes) if sized else (subs,_dec_subscription,(self,))
+		self.template=conn.prepare(self.query)
+
+	def poll(self):
+		"read all signals, returns changed values {name:value}"
+		return self.template.execute(self.conn)
+
+	def _update(self,conn,st):
+		"intern function - compare raw payloads, decode and report changed signals"
+		raw=self.raw;errors=self.errors
+		ret={}
+		for name,first,n,dec,args,deadband in self.signals:
+			changed=False
+			for i in range(first,first+n):
+				x=st[i]
+				if "data" not in x:
+					break
+				if raw[i] is None or raw[i]!=x["data"] or errors[i]!=("error" in x):
+					changed=True
+			else:
+				if not changed:
+					continue
+				for i in range(first,first+n):
+					raw[i]=bytes(st[i]["data"])
+					errors[i]="error" in st[i]
+				value=dec(conn,st[first:first+n],*args)
+				if name in self.values and _within(self.values[name],value,deadband):
+					continue
+				self.values[name]=ret[name]=value
+		return ret
@@ -0,0 +1,216 @@
+import os,sys,re,math,socketserver,threading
+from struct import pack,unpack
+import pytest
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pyfanuc import pyfanuc
+from fanucsim import fanucsim
+
+FRAMEHEAD=b'\xa0\xa0\xa0\xa0'
+
+def frame(ftype,payload):
+	"response frame"
+	return FRAMEHEAD+pack(">HHH",2,ftype,len(payload))+payload
+def val8(v,decimals=4):
+	"8 byte value, vacant for None"
+	if v is None:
+		return pack(">iBBBB",0,0,10,0xff,0xff)
+	return pack(">iBBBB",int(round(v*10**decimals)),0,10,0,decimals)
+
+class fakecnc(object):
+	"""
+	Scripted controller on 127.0.0.1 for unit tests
+	21 01 subpackets are answered by handlers {(c1,c2,c3):fn(v1,v2,v3,v4,v5,payload)} returning the payload
+	or an error code (int), unknown commands get error 1,
+	15 01 reads and 11 01 writes programs {name or full path:text}, folders are the ones of the full paths,
+listprog (06) lists the numbered programs without path, dir entries have the datetime mtime,
+	fragment: bytes per send (0 whole frame), stall: connections that stop answering 21 01 at their next request,
+	hangup: connections that are closed at their next 21 01 request, opn=False answers OPN with garbage,
+	requests records the subpackets (c1,c2,c3,v1,v2,v3,v4,v5) of every 21 01 request
+	"""
+	def __init__(self,fragment=0):
+		self.fragment=fragment
+		self.stall=0
+		self.hangup=0
+		self.opn=True
+		self.maxaxis=8
+		self.axisnames=["X","Y","Z","B"]
+		self.macros={}
+		self.programs={}
+		self.mtime=(2024,1,2,3,4,5)
+		self.requests=[]
+		self.frames=0
+		self.connections=0
+		self.lock=threading.Lock()
+		self.handlers={
+			(1,1,0x18):lambda *a:pack(">HH2s2s4s4s2s",0,self.maxaxis,b"31",b" M",b"G421",b"08.0",b"04"),
+			(1,1,0x19):lambda *a:pack(">7H",1,0,0,0,0,0,0),
+			(1,1,0x89):lambda *a:b''.join(n.encode().ljust(4,b'\0') for n in self.axisnames),
+			(1,1,0x8a):lambda *a:b'S\0\0\0',
+			(1,1,0xa4):lambda v1,*a:pack(">h",len(self.axisnames) if v1==0 else 1) if v1 in (0,1) else 5,
+			(1,1,0x15):lambda v1,v2,*a:b''.join(val8(self.macros.get(n)) for n in range(v1,max(v1,v2)+1)),
+			(1,1,0xa7):lambda v1,v2,*a:b''.join(pack(">d",math.nan if self.macros.get(n) is None else self.macros[n])
+				for n in range(v1,max(v1,v2)+1)),
+			(1,1,0x06):lambda v1,v2,*a:b''.join(pack(">II64s",int(p[1:]),len(t.encode()),b'')
+				for p,t in sorted(self.programs.items()) if re.match(r"^O\d+$",p) and int(p[1:])>=v1)[0:v2*72],
+			(1,1,0xb4):lambda *a:self._dirinfo(self._path(a[-1])),
+			(1,1,0xb3):lambda v1,v2,*a:self._readdir(self._path(a[-1]),v1,v2),
+			(1,1,0xb6):lambda *a:self._delete(self._path(a[-1])),
+		}
+		cnc=self
+		class handler(socketserver.BaseRequestHandler):
+			def handle(self):
+				try:
+					cnc._serve(self.request)
+				except OSError:
+					pass
+		self.server=socketserver.ThreadingTCPServer(("127.0.0.1",0),handler)
+		self.server.daemon_threads=True
+		self.host,self.port=self.server.server_address
+		self.thread=threading.Thread(target=self.server.serve_forever,args=(0.05,),daemon=True)
+		self.thread.start()
+	def close(self):
+		self.server.shutdown()
+		self.server.server_close()
+		self.thread.join()
+
+	def _recv(self,sock,n):
+		buf=b''
+		while len(buf)<n:
+			r=sock.recv(n-len(buf))
+			if not r:
+				return None
+			buf+=r
+		return buf
+	def _send(self,sock,data):
+		step=self.fragment or len(data)
+		for pos in range(0,len(data),step):
+			sock.sendall(data[pos:pos+step])
+	def _serve(self,sock):
+		with self.lock:
+			self.connections+=1
+		stalled=False
+		folder=None;upload=b''
+		while True:
+			head=self._recv(sock,10)
+			if head is None or head[0:4]!=FRAMEHEAD:
+				return
+			ftype,flen=unpack(">HH",head[6:10])
+			data=self._recv(sock,flen) if flen else b''
+			with self.lock:
+				self.frames+=1
+			if ftype==0x0101:
+				self._send(sock,frame(0x0102,b'') if self.opn else b'\0'*10)
+			elif ftype==0x0201:
+				self._send(sock,frame(0x0202,b''))
+				return
+			elif ftype==0x2101:
+				with self.lock:
+					if not stalled and self.stall>0:
+						self.stall-=1
+						stalled=True
+					if self.hangup>0:
+						self.hangup-=1
+						return
+				if not stalled:
+					self._send(sock,frame(0x2102,self._multi(data)))
+			elif ftype==0x1501:
+				name=data[4:].split(b'\0',1)[0].decode().split("-",1)[0]
+				text=self.programs.get(name,"").encode()
+				self._send(sock,frame(0x1502,b''))
+				for pos in range(0,len(text),0x500):
+					self._send(sock,frame(0x1604,text[pos:pos+0x500]))
+				self._send(sock,frame(0x1701,b''))
+			elif ftype==0x1101:
+				folder=data[4:].split(b'\0',1)[0].decode()[2:]
+				upload=b''
+				self._send(sock,frame(0x1102,b''))
+			elif ftype==0x1204:
+				upload+=data
+			elif ftype==0x1301:
+				name=re.search(r"(O\d+|<[^>]+>)",upload.decode()).group(1).strip("<>")
+				if folder+name in self.programs:
+					self._send(sock,frame(0x1404,pack(">HHH",0x2006,0x0005,0x0004)))
+				else:
+					self.programs[folder+name]=upload.decode()
+					self._send(sock,frame(0x1302,b''))
+	def _path(self,payload):
+		return bytes(payload).split(b'\0',1)[0].decode()
+	def _listdir(self,folder):
+		"folders (with /) and programs of folder, None for unknown folder"
+		entries=set()
+		for p in self.programs:
+			if p.startswith(folder) and p!=folder:
+				rest=p[len(folder):]
+				entries.add(rest.split("/",1)[0]+"/" if "/" in rest else rest)
+		if not entries:
+			return None
+		return sorted(e for e in entries if e.endswith("/"))+sorted(e for e in entries if not e.endswith("/"))
+	def _dirinfo(self,folder):
+		entries=self._listdir(folder)
+		if entries is None:
+			return 5
+		dirs=sum(1 for e in entries if e.endswith("/"))
+		return pack(">ii",dirs,len(entries)-dirs)
+	def _readdir(self,folder,first,count):
+		entries=self._listdir(folder)
+		if entries is None:
+			return 5
+		out=b''
+		for e in entries[first:first+count]:
+			if e.endswith("/"):
+				out+=pack(">h6H6xII36s52s12x",0,0,0,0,0,0,0,0,0,e[:-1].encode(),b'')
+			else:
+				text=self.programs[folder+e]
+				comment=re.search(r"\(([^)]*)\)",text)
+				out+=pack(">h6H6xII36s52s12x",1,*self.mtime,len(text.encode()),0,e.encode(),
+					comment.group(1).encode() if comment else b'')
+		return out
+	def _delete(self,path):
+		if self.programs.pop(path,None) is None:
+			return 5
+		return b''
+	def _multi(self,data):
+		count=unpack(">H",data[0:2])[0]
+		pos=2;out=[pack(">H",count)];cmds=[]
+		for t in range(count):
+			n=unpack(">H",data[pos:pos+2])[0]
+			sub=data[pos+2:pos+n]
+			pos+=n
+			cmd=unpack(">HHHiiiii",sub[0:26])
+			cmds.append(cmd)
+			fn=self.handlers.get(cmd[0:3])
+			r=1 if fn is None else fn(*cmd[3:],sub[26:])
+			if isinstance(r,int):
+				r=sub[0:6]+pack(">h",r)+b'\0'*6
+			else:
+				r=sub[0:6]+b'\0'*6+pack(">H",len(r))+r
+			out.append(pack(">H",len(r)+2)+r)
+		with self.lock:
+			self.requests.append(cmds)
+		return b''.join(out)
+
+@pytest.fixture
+def cnc():
+	c=fakecnc()
+	yield c
+	c.close()
+
+@pytest.fixture
+def conn(cnc):
+	c=pyfanuc(cnc.host,cnc.port)
+	assert c.connect()
+	yield c
+	c.sock.close()
+
+@pytest.fixture
+def sim():
+	with fanucsim() as s:
+		yield s
+
+@pytest.fixture
+def simconn(sim):
+	c=pyfanuc(sim.host,sim.port)
+	assert c.connect()
+	yield c
+	c.sock.close()
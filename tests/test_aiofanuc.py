@@ -0,0 +1,55 @@
+import asyncio
+import pytest
+from aiofanuc import AsyncFanuc
+
+def run(coro):
+	return asyncio.run(coro)
+
+async def _connect(cnc):
+	conn=AsyncFanuc(cnc.host,cnc.port)
+	assert await conn.connect()
+	return conn
+
+def test_connect_and_getter(cnc):
+	cnc.macros={500:1.5}
+	async def main():
+		conn=await _connect(cnc)
+		assert conn.sysinfo["maxaxis"]==8
+		assert await conn.readmacro(500)=={500:1.5}
+		assert (await conn.getstatinfo())["aut"]==1
+		assert await conn.disconnect()
+	run(main())
+
+def test_connect_without_opn_response(cnc):
+	cnc.opn=False
+	async def main():
+		conn=AsyncFanuc(cnc.host,cnc.port)
+		assert not await conn.connect()
+		assert conn.writer.is_closing()
+	run(main())
+
+def test_batch(cnc):
+	cnc.macros={1:1.0,2:2.0}
+	async def main():
+		conn=await _connect(cnc)
+		b=conn.batch()
+		b.readmacro(1);b.readmacro(2);b.readactfeed()
+		frames=cnc.frames
+		assert await b.execute()==[{1:1.0},{2:2.0},None]
+		assert cnc.frames-frames==1
+	run(main())
+
+def test_getprog_and_uploadprog(cnc):
+	cnc.programs["O3000"]="%\nO3000\nG0 X1\nM30\n%"
+	async def main():
+		conn=await _connect(cnc)
+		assert await conn.getprog(3000)==cnc.programs["O3000"]
+		assert await conn.getproghead(3000,8)=="%\nO3000\n"
+		progress=[]
+		text="%\nO3001\n"+"G1 X1 F100\n"*200+"M30\n%"
+		assert await conn.uploadprog("//CNC_MEM/USER/PATH1/",text,lambda b,r:progress.append(b))
+		assert cnc.programs["//CNC_MEM/USER/PATH1/O3001"]==text
+		assert progress[-1]==len(text)
+		with pytest.raises(Exception,match="already exists"):
+			await conn.uploadprog("//CNC_MEM/USER/PATH1/",text)
+	run(main())
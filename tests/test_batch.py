@@ -0,0 +1,38 @@
+def test_batch_split_into_frames(cnc,conn):
+	cnc.macros={n:float(n) for n in range(1,41)}
+	conn.maxframe=200
+	b=conn.batch()
+	idx=[b.readmacro(n) for n in range(1,41)]+[b.getstatinfo()]
+	frames=cnc.frames
+	r=b.execute()
+	assert cnc.frames-frames>1
+	assert [r[i] for i in idx[:-1]]==[{n:float(n)} for n in range(1,41)]
+	assert r[idx[-1]]==conn.getstatinfo()
+
+def test_batch_one_frame(cnc,conn):
+	b=conn.batch()
+	b.readmacro(1);b.getstatinfo();b.readmacro(2)
+	frames=cnc.frames
+	r=b.execute()
+	assert cnc.frames-frames==1
+	assert r==[{1:None},conn.getstatinfo(),{2:None}]
+
+def test_plan_respects_maxframe(conn):
+	conn.maxframe=100
+	subs=[conn._req_rdsub(1,1,0x15,n,n) for n in range(10)]
+	frames=conn._req_frames(subs)
+	assert [len(f) for f in frames]==[3,3,3,1]
+	assert [s for f in frames for s in f]==subs
+
+def test_plan_respects_maxresp(conn):
+	conn.maxresp=100
+	subs=[conn._req_rdsub(1,1,0x15,n,n+3) for n in range(0,40,4)]
+	frames=conn._req_frames(subs,[32]*len(subs))
+	assert [len(f) for f in frames]==[2]*5
+	assert [s for f in frames for s in f]==subs
+
+def test_error_subpacket(cnc,conn):
+	cnc.handlers[(1,1,0x24)]=lambda *a:6
+	b=conn.batch()
+	b.readactfeed();b.readmacro(1)
+	assert b.execute()==[None,{1:None}]
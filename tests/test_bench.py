@@ -0,0 +1,16 @@
+import json
+import bench
+
+def test_smoke_run_and_regression(tmp_path):
+	out=str(tmp_path/"bench.json")
+	assert bench.main(["--rtt","0","--sessions","2","--duration","0.05","--size","20000","--out",out])==0
+	report=json.load(open(out))
+	groups={r["group"] for r in report["results"]}
+	assert groups=={"codec","requests","transfer","fleet"} and all(r["value"]>0 for r in report["results"])
+	for r in report["results"]:
+		r["value"]*=100
+	with open(out,"w") as f:
+		json.dump(report,f)
+	assert bench.main(["--rtt","0","--sessions","2","--duration","0.05","--size","20000","--out",str(tmp_path/"b2.json"),
+		"--baseline",out])==1
+	assert json.load(open(str(tmp_path/"b2.json")))["regressions"]
@@ -0,0 +1,62 @@
+import os,threading
+from struct import pack
+from pyfanuc import pyfanuc,pyfanuccache
+
+def _fast(cnc,cache):
+	conn=pyfanuc(cnc.host,cnc.port,cache)
+	frames=cnc.frames
+	assert conn.connect(fast=True)
+	assert cnc.frames-frames==1 #OPN only
+	return conn
+
+def test_fast_connect_from_cache(cnc,tmp_path):
+	cache=pyfanuccache(str(tmp_path/"meta.json"))
+	assert pyfanuc(cnc.host,cnc.port,cache).connect()
+	conn=_fast(cnc,cache)
+	assert conn.sysinfo["maxaxis"]==8 and conn.axisnames==["X","Y","Z","B"] and conn.axiscount==4
+	frames=cnc.frames
+	cnc.macros[1]=2.0
+	assert conn.readmacro(1)=={1:2.0}
+	assert cnc.frames-frames==1 #revalidation in the same frame
+	assert not conn.revalidate
+
+def test_axiscount_reads_controlled_axes(conn,cnc,tmp_path):
+	conn.cache=pyfanuccache(str(tmp_path/"meta.json"))
+	conn._loadmeta()
+	assert [c[3] for c in cnc.requests[-1] if c[2]==0xa4]==[0]
+	assert conn.axiscount==4
+
+def test_revalidation_reloads_changed_metadata(cnc,tmp_path):
+	cache=pyfanuccache(str(tmp_path/"meta.json"))
+	assert pyfanuc(cnc.host,cnc.port,cache).connect()
+	cnc.maxaxis=6
+	cnc.axisnames=["X","Y","Z","A","B","C"]
+	conn=_fast(cnc,cache)
+	assert conn.sysinfo["maxaxis"]==8
+	conn.readmacro(1)
+	assert conn.sysinfo["maxaxis"]==6 and conn.axisnames==["X","Y","Z","A","B","C"]
+	assert pyfanuccache(cache.path).get(cnc.host)["axisnames"]==["X","Y","Z","A","B","C"]
+
+def test_single_requests_revalidate(cnc,tmp_path):
+	cnc.handlers[(1,1,0x1a)]=lambda *a:pack(">L",5)
+	cache=pyfanuccache(str(tmp_path/"meta.json"))
+	assert pyfanuc(cnc.host,cnc.port,cache).connect()
+	cnc.maxaxis=4
+	conn=_fast(cnc,cache)
+	assert conn.readalarm()==5
+	assert conn.sysinfo["maxaxis"]==4 and not conn.revalidate
+
+def test_concurrent_put(tmp_path):
+	cache=pyfanuccache(str(tmp_path/"meta.json"))
+	def worker(n):
+		for i in range(20):
+			cache.put("10.0.0.%i"%n,{"n":n,"i":i})
+			assert cache.get("10.0.0.%i"%n)["n"]==n
+	threads=[threading.Thread(target=worker,args=(n,)) for n in range(8)]
+	for t in threads:
+		t.start()
+	for t in threads:
+		t.join()
+	assert os.listdir(str(tmp_path))==["meta.json"]
+	data=pyfanuccache(cache.path)
+	assert {ip:data.get(ip) for ip in cache.data}=={"10.0.0.%i"%n:{"n":n,"i":19} for n in range(8)}
@@ -0,0 +1,24 @@
+import pytest
+from struct import pack
+from conftest import frame
+from pyfanuc import pyfanuc
+
+def test_decap_subpackets_are_views():
+	conn=pyfanuc("127.0.0.1")
+	subs=[b'\0\1\0\1\0\x15'+b'\0'*8,b'\0\1\0\1\0\x19'+b'\0'*6+pack(">H",2)+b'\0\1']
+	data=conn._decap(bytearray(frame(0x2102,pack(">H",2)+b''.join(pack(">H",len(s)+2)+s for s in subs))))
+	assert data["ftype"]==0x2102 and [bytes(s) for s in data["data"]]==subs
+	assert all(isinstance(s,memoryview) for s in data["data"])
+
+def test_decap_rejects_bad_frames():
+	conn=pyfanuc("127.0.0.1")
+	assert conn._decap(b'\0'*10)=={"len":-1}
+	assert conn._decap(frame(0x2102,b'\0\0')[:-1])=={"len":-1}
+
+def test_uploadresult_shows_payload_bytes():
+	conn=pyfanuc("127.0.0.1")
+	assert conn._uploadresult(conn._decap(frame(0x1302,b'')))
+	with pytest.raises(Exception,match="already exists"):
+		conn._uploadresult(conn._decap(frame(0x1404,pack(">HHH",0x2006,5,4))))
+	with pytest.raises(Exception,match=r"'data': b'\\x00\\x01'"):
+		conn._uploadresult(conn._decap(frame(0x1502,b'\0\1')))
@@ -0,0 +1,29 @@
+import math,subprocess,sys,os
+from struct import pack
+from conftest import val8
+import pyfanuc as module
+from pyfanuc import pyfanuc
+
+ROOT=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_import_does_not_load_numpy():
+	out=subprocess.check_output([sys.executable,"-c","import sys,pyfanuc;print('numpy' in sys.modules)"],cwd=ROOT)
+	assert out.strip()==b"False"
+
+def test_decode8array_matches_decode8():
+	conn=pyfanuc("127.0.0.1")
+	data=b'\0'*4+val8(1.5)+val8(None)+pack(">iBBBB",-3,0,2,0,1)+pack(">iBBBB",7,0,3,0,0)
+	values=[conn._decode8(data,pos) for pos in range(4,len(data),8)]
+	assert values==[1.5,None,-1.5,None]
+	r=list(conn._decode8array(data,4))
+	assert r[0]==1.5 and math.isnan(r[1]) and r[2]==-1.5 and math.isnan(r[3])
+	assert conn._decode8list(data,4)==values
+
+def test_decode8list_without_numpy(monkeypatch):
+	monkeypatch.setattr(module,"_numpy",lambda:None)
+	conn=pyfanuc("127.0.0.1")
+	data=val8(2.25)+val8(None)
+	assert conn._decode8list(data)==[2.25,None]
+	r=conn._decode8array(data)
+	assert r[0]==2.25 and math.isnan(r[1])
+	assert conn._decode8rows(data,0,2,16,1) is None
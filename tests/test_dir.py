@@ -0,0 +1,55 @@
+LIBRARY="//CNC_MEM/USER/LIBRARY/"
+
+def _fill(cnc,n):
+	cnc.programs["//CNC_MEM/USER/PATH1/O3000"]="%\nO3000\nM30\n%"
+	for i in range(n):
+		cnc.programs[LIBRARY+"O%04i" % (5000+i)]="%%\nO%04i(P%i)\nM30\n%%" % (5000+i,i)
+
+def test_iterdir_pages(cnc,conn):
+	_fill(cnc,45)
+	conn.maxsubresp=128*4
+	frames=cnc.frames;n=len(cnc.requests)
+	entries=list(conn.iterdir(LIBRARY))
+	assert [e["name"] for e in entries]==["O%04i" % (5000+i) for i in range(45)]
+	assert entries[7]["comment"]=="P7" and entries[7]["type"]=="F"
+	assert cnc.frames-frames>2
+	assert [c[2:5] for c in cnc.requests[n]]==[(0xb4,0,0),(0xb3,0,4)]
+	assert conn.readdir_complete(LIBRARY)==entries
+
+def test_count_and_first_page_in_one_frame(cnc,conn):
+	_fill(cnc,3)
+	frames=cnc.frames
+	assert len(conn.readdir_complete(LIBRARY))==3
+	assert cnc.frames-frames==1
+	assert [c[2] for c in cnc.requests[-1]]==[0xb4,0xb3]
+
+def test_iterdir_window_fewer_frames(cnc,conn):
+	_fill(cnc,45)
+	conn.maxsubresp=128*4
+	conn.maxresp=1024
+	frames=cnc.frames
+	lockstep=list(conn.iterdir(LIBRARY))
+	lockstepframes=cnc.frames-frames
+	conn.window=4
+	frames=cnc.frames
+	assert list(conn.iterdir(LIBRARY))==lockstep
+	assert cnc.frames-frames<=lockstepframes
+
+def test_iterdir_lazy(cnc,conn):
+	_fill(cnc,45)
+	conn.maxsubresp=128*4
+	frames=cnc.frames
+	it=conn.iterdir(LIBRARY)
+	assert next(it)["name"]=="O5000"
+	assert cnc.frames-frames==1
+	it.close()
+
+def test_iterdir_recursive(cnc,conn):
+	_fill(cnc,3)
+	entries=list(conn.iterdir("//CNC_MEM/",True))
+	names=[(e["path"],e["name"]) for e in entries]
+	assert ("//CNC_MEM/USER/","LIBRARY") in names and ("//CNC_MEM/USER/PATH1/","O3000") in names
+	assert ("//CNC_MEM/USER/LIBRARY/","O5002") in names
+
+def test_iterdir_unknown_folder(conn):
+	assert list(conn.iterdir("//CNC_MEM/NONE/"))==[]
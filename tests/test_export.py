@@ -0,0 +1,69 @@
+import csv,math
+import pytest
+from export import columnwriter
+
+AXES={"ABS":[1.5,-2.0,None],"REL":None}
+PARAM={1320:{"type":4,"axis":-1,"data":[10.0,20.0]},20:{"type":0,"axis":0,"data":[4]},1821:{"type":3,"axis":2,"data":[0.5]}}
+STATINFO={"aut":1,"run":3,"emegency":0}
+
+def _rows(path):
+	with open(path,newline="") as f:
+		return list(csv.reader(f))
+
+def test_flatten_shapes(tmp_path):
+	w=columnwriter(str(tmp_path/"out.csv"))
+	assert list(w._flatten("axes",AXES,0))==[("axes.ABS",1,1.5),("axes.ABS",2,-2.0)]
+	assert list(w._flatten("param",PARAM,0))==[("param.1320",1,10.0),("param.1320",2,20.0),("param.20",0,4.0),
+		("param.1821",2,0.5)]
+	assert list(w._flatten("stat",STATINFO,0))==[("stat.aut",0,1.0),("stat.run",0,3.0),("stat.emegency",0,0.0)]
+	assert list(w._flatten("pos",[0.5,math.nan,2.0],0))==[("pos",1,0.5),("pos",3,2.0)]
+	assert list(w._flatten("name","PATH1",0))==[] and list(w._flatten("x",None,0))==[]
+
+def test_csv_round_trip(tmp_path):
+	path=str(tmp_path/"out.csv")
+	with columnwriter(path) as w:
+		w.append("10.0.0.1","axes",100.0,AXES)
+		w({"machine":"10.0.0.2","signal":"param","time":101.0,"value":PARAM})
+		w({"machine":"10.0.0.2","signal":"stat","time":102.0,"error":"timeout"})
+		w.append("10.0.0.1","stat",103.0,STATINFO)
+	rows=_rows(path)
+	assert rows[0]==["time","machine","signal","axis","value"]
+	assert rows[1:]==[["100.0","10.0.0.1","axes.ABS","1","1.5"],["100.0","10.0.0.1","axes.ABS","2","-2.0"],
+		["101.0","10.0.0.2","param.1320","1","10.0"],["101.0","10.0.0.2","param.1320","2","20.0"],
+		["101.0","10.0.0.2","param.20","","4.0"],["101.0","10.0.0.2","param.1821","2","0.5"],
+		["103.0","10.0.0.1","stat.aut","","1.0"],["103.0","10.0.0.1","stat.run","","3.0"],
+		["103.0","10.0.0.1","stat.emegency","","0.0"]]
+	assert w.written==9
+
+def test_flush_after_rows(tmp_path):
+	path=str(tmp_path/"out.csv")
+	w=columnwriter(path,rows=4)
+	w.append("m","axes",1.0,AXES)
+	assert len(w)==2 and not (tmp_path/"out.csv").exists()
+	w.append("m","axes",2.0,AXES)
+	assert len(w)==0 and w.written==4 and len(_rows(path))==5
+	w.append("m","stat",3.0,STATINFO)
+	w.close()
+	assert w.written==7 and len(_rows(path))==8 and _rows(path).count(_rows(path)[0])==1
+
+def test_arrow_requires_pyarrow(tmp_path,monkeypatch):
+	import export
+	monkeypatch.setattr(export,"pyarrow",None)
+	with pytest.raises(ImportError):
+		columnwriter(str(tmp_path/"out.parquet"))
+
+@pytest.mark.parametrize("name",["out.parquet","out.arrow"])
+def test_pyarrow_formats(tmp_path,name):
+	pyarrow=pytest.importorskip("pyarrow")
+	import pyarrow.ipc,pyarrow.parquet
+	path=str(tmp_path/name)
+	with columnwriter(path,rows=3) as w:
+		w.append("10.0.0.1","axes",100.0,AXES)
+		w.append("10.0.0.2","param",101.0,PARAM)
+	if name.endswith(".parquet"):
+		table=pyarrow.parquet.read_table(path)
+	else:
+		table=pyarrow.ipc.open_file(path).read_all()
+	assert table.num_rows==6 and table.column_names==["time","machine","signal","axis","value"]
+	assert table.column("signal").to_pylist()[2:4]==["param.1320","param.1320"]
+	assert table.column("axis").to_pylist()==[1,2,1,2,0,2]
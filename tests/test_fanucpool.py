@@ -0,0 +1,62 @@
+import socket,time
+import pytest
+from conftest import fakecnc
+from fanucpool import fanucpool
+
+def test_acquire_release_reuses_session(cnc):
+	pool=fanucpool()
+	a=pool.acquire(cnc.host,cnc.port)
+	b=pool.acquire(cnc.host,cnc.port)
+	assert a is not b
+	pool.release(a)
+	assert pool.acquire(cnc.host,cnc.port) is a
+	assert cnc.connections==2
+	pool.release(b)
+	pool.closeall()
+	assert not b.connected
+
+def test_lru_eviction(cnc):
+	pool=fanucpool(maxidle=2)
+	conns=[pool.acquire(cnc.host,cnc.port) for i in range(3)]
+	for c in conns:
+		pool.release(c)
+	assert list(pool.idle)==conns[1:] and not conns[0].connected
+	assert pool.acquire(cnc.host,cnc.port) is conns[2]
+
+def test_idle_time_eviction(cnc):
+	pool=fanucpool(idletime=0.05)
+	a=pool.acquire(cnc.host,cnc.port)
+	pool.release(a)
+	time.sleep(0.1)
+	b=pool.acquire(cnc.host,cnc.port)
+	assert b is not a and not a.connected and cnc.connections==2
+
+def test_health_check_replaces_dead_session(cnc):
+	pool=fanucpool(checkafter=0)
+	a=pool.acquire(cnc.host,cnc.port)
+	pool.release(a)
+	assert pool.acquire(cnc.host,cnc.port) is a
+	pool.release(a)
+	cnc.hangup=1
+	b=pool.acquire(cnc.host,cnc.port)
+	assert b is not a and b.readmacro(1)=={1:None}
+
+@pytest.mark.parametrize("error",[socket.timeout,ConnectionResetError])
+def test_run_retries_with_new_session(cnc,error):
+	pool=fanucpool()
+	sessions=[]
+	def fn(conn):
+		sessions.append(conn)
+		if len(sessions)==1:
+			raise error()
+		return conn.readmacro(1)
+	assert pool.run(cnc.host,fn,cnc.port)=={1:None}
+	assert sessions[0] is not sessions[1] and not sessions[0].connected
+	with pytest.raises(error):
+		pool.run(cnc.host,lambda conn:(_ for _ in ()).throw(error()),cnc.port)
+
+def test_failed_connect_closes_socket(cnc):
+	cnc.opn=False
+	pool=fanucpool()
+	with pytest.raises(ConnectionError):
+		pool.acquire(cnc.host,cnc.port)
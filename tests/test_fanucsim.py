@@ -0,0 +1,67 @@
+import time
+import pytest
+from fanucsim import fanucsim
+from pyfanuc import pyfanuc
+
+def _connect(sim):
+	conn=pyfanuc(sim.host,sim.port)
+	assert conn.connect()
+	return conn
+
+def test_sample_machine(sim,simconn):
+	assert simconn.sysinfo["maxaxis"]==8 and simconn.getstatinfo()["aut"]==1
+	assert simconn.readaxes(pyfanuc.ABS)["ABS"][0:2]==[311.1657,17.9202]
+	assert simconn.readparam2(-1,1320)[1320]["data"]==[999.999]*8
+	assert simconn.listprog()=={3000:{"size":len(sim.programs[sim.cwd+"O3000"]),"comment":""}}
+
+def test_errors(sim,simconn):
+	assert simconn.readactspindlespeed() is None
+	assert simconn.readactfeed()==0
+	sim.errors[(1,1,0x15,500)]=5
+	assert simconn.readmacros(499,501)=={499:None,500:None,501:None}
+	assert [x.get("error") for x in simconn._req_rdframe([simconn._req_rdsub(1,1,0x15,500,500)])]==[5]
+
+def test_axis_and_spindle_count(sim,simconn):
+	r=simconn._req_rdframe([simconn._req_rdsub(1,1,0xa4,v1) for v1 in (0,1,2)])
+	assert [bytes(x["data"]) for x in r[0:2]]==[b'\0\4',b'\0\1'] and r[2]["error"]==1
+
+@pytest.mark.parametrize("fragment",[1,3,7,64])
+def test_fragmented_responses(fragment):
+	with fanucsim(fragment=fragment) as sim:
+		sim.macros={500:1.5,501:-2.25}
+		conn=_connect(sim)
+		assert conn.readmacros(500,502)=={500:1.5,501:-2.25,502:None}
+		assert conn.getprog(3000)==sim.programs[sim.cwd+"O3000"]
+		assert [e["name"] for e in conn.iterdir(sim.cwd)]==["O3000"]
+		assert conn.disconnect()
+
+def test_latency_overlaps_pipelined_frames():
+	with fanucsim(latency=0.01) as sim:
+		conn=_connect(sim)
+		conn.maxsubresp=64;conn.maxresp=256
+		start=time.perf_counter()
+		conn.readmacros(1,320)
+		lockstep=time.perf_counter()-start
+		conn.window=4
+		start=time.perf_counter()
+		conn.readmacros(1,320)
+		assert time.perf_counter()-start<lockstep/2
+
+def test_stall(sim):
+	conn=_connect(sim)
+	conn.sock.settimeout(0.2)
+	sim.stall=1
+	with pytest.raises(OSError):
+		conn.readmacro(1)
+	assert _connect(sim).readmacro(1)=={1:None}
+
+def test_program_write_and_delete(sim,simconn):
+	assert simconn.uploadprog("//CNC_MEM/USER/LIBRARY/","%\nO7000\nM30\n%")
+	assert sim.programs["//CNC_MEM/USER/LIBRARY/O7000"]=="%\nO7000\nM30\n%" and sim.uploads==["//CNC_MEM/USER/LIBRARY/O7000"]
+	with pytest.raises(Exception,match="already exists"):
+		simconn.uploadprog("//CNC_MEM/USER/LIBRARY/","%\nO7000\nM30\n%")
+	with pytest.raises(Exception,match="0x1"):
+		simconn.uploadprog("//CNC_MEM/NONE/","%\nO7001\nM30\n%")
+	assert [e["name"] for e in simconn.iterdir("//CNC_MEM/USER/LIBRARY/")]==["O7000"]
+	assert simconn.deleteprog("//CNC_MEM/USER/LIBRARY/O7000")
+	assert "//CNC_MEM/USER/LIBRARY/O7000" not in sim.programs
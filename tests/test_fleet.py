@@ -0,0 +1,48 @@
+import time
+from conftest import fakecnc
+from fleet import fleetpoller
+
+def _collect(poller,seconds):
+	with poller:
+		time.sleep(seconds)
+	return list(poller.results(0))
+
+def test_schedule(cnc):
+	other=fakecnc()
+	try:
+		cnc.macros[1]=1.0;other.macros[1]=2.0
+		poller=fleetpoller([(cnc.host,cnc.port),(other.host,other.port)],
+			{"fast":(0.05,"readmacro",(1,)),"slow":(60,"getstatinfo",())})
+		r=_collect(poller,0.4)
+		for c,value in ((cnc,{1:1.0}),(other,{1:2.0})):
+			mine=[x for x in r if x["signal"]=="fast" and x["value"]==value]
+			assert 4<=len(mine)<=9
+		assert len(r)==len([x for x in r if x["signal"]=="fast"])+2
+	finally:
+		other.close()
+
+def test_due_signals_batched(cnc):
+	poller=fleetpoller([(cnc.host,cnc.port)],{"a":(60,"readmacro",(1,)),"b":(60,"readmacro",(2,)),"c":(60,"readactfeed",())})
+	cnc.handlers[(1,1,0x24)]=lambda *a:b'\0\0\0\x05\0\x0a\0\0'
+	r=_collect(poller,0.2)
+	assert sorted(x["signal"] for x in r)==["a","b","c"] and r[0]["time"]==r[2]["time"]
+	assert [c[2:4] for c in cnc.requests[-1]]==[(0x15,1),(0x15,2),(0x24,0)]
+
+def test_backoff_unreachable():
+	down=fakecnc()
+	down.close()
+	poller=fleetpoller([(down.host,down.port)],{"a":(0.01,"readmacro",(1,))},backoff=(0.1,1))
+	r=_collect(poller,0.45)
+	assert 2<=len(r)<=4 and all("error" in x for x in r)
+
+def test_redial_after_hangup(cnc):
+	cnc.macros[1]=1.0
+	poller=fleetpoller([(cnc.host,cnc.port)],{"a":(0.05,"readmacro",(1,))},backoff=(0.05,1))
+	with poller:
+		time.sleep(0.15)
+		cnc.hangup=1
+		time.sleep(0.4)
+	r=list(poller.results(0))
+	errors=[i for i,x in enumerate(r) if "error" in x]
+	assert len(errors)==1 and 0<errors[0]<len(r)-1
+	assert cnc.connections==2
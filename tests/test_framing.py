@@ -0,0 +1,38 @@
+import socket
+import pytest
+from conftest import fakecnc,frame
+from pyfanuc import pyfanuc
+
+@pytest.mark.parametrize("fragment",[1,3,7])
+def test_fragmented_responses(fragment):
+	cnc=fakecnc(fragment)
+	try:
+		cnc.macros={500:1.5,501:-2.25}
+		conn=pyfanuc(cnc.host,cnc.port)
+		assert conn.connect()
+		assert conn.sysinfo["maxaxis"]==8
+		assert conn.readmacro(500)=={500:1.5}
+		assert conn.readmacro(501)=={501:-2.25}
+		assert conn.disconnect()
+	finally:
+		cnc.close()
+
+def test_back_to_back_frames_are_split():
+	a,b=socket.socketpair()
+	try:
+		b.sendall(frame(0x2102,b'\x00\x01')+frame(0x0202,b''))
+		conn=pyfanuc("127.0.0.1")
+		assert bytes(conn._recvframe(a))==frame(0x2102,b'\x00\x01')
+		assert bytes(conn._recvframe(a))==frame(0x0202,b'')
+	finally:
+		a.close();b.close()
+
+def test_closed_connection_raises():
+	a,b=socket.socketpair()
+	try:
+		b.sendall(frame(0x2102,b'\x00\x01\x00')[0:12])
+		b.close()
+		with pytest.raises(ConnectionResetError):
+			pyfanuc("127.0.0.1")._recvframe(a)
+	finally:
+		a.close()
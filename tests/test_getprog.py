@@ -0,0 +1,23 @@
+import io
+
+TEXT="%\nO1234(TEST ÄÖ)\n"+"G01 X1.0 Y2.0\n"*400+"M30\n%"
+
+def test_getprog_by_number_and_path(cnc,conn):
+	cnc.programs={"O1234":TEXT,"//CNC_MEM/USER/PATH1/O1234":"%\nO1234\n%"}
+	sizes=[]
+	assert conn.getprog(1234,sizes.append)==TEXT
+	assert sizes[-1]==len(TEXT.encode()) and len(sizes)>1
+	assert conn.getprog("//CNC_MEM/USER/PATH1/O1234")=="%\nO1234\n%"
+
+def test_iterprog_streams_chunks(cnc,conn):
+	cnc.programs={"O1234":TEXT}
+	chunks=list(conn.iterprog("o1234"))
+	assert len(chunks)==len(TEXT.encode())//0x500+1 and "".join(chunks)==TEXT
+
+def test_saveprog_writes_raw_bytes(cnc,conn,tmp_path):
+	cnc.programs={"O1234":TEXT}
+	f=io.BytesIO()
+	assert conn.saveprog(1234,f)==len(TEXT.encode())
+	assert f.getvalue()==TEXT.encode()
+	assert conn.saveprog(1234,str(tmp_path/"O1234"))==len(TEXT.encode())
+	assert (tmp_path/"O1234").read_bytes()==TEXT.encode()
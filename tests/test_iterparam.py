@@ -0,0 +1,36 @@
+import pytest
+from struct import pack
+from conftest import val8
+
+def _params(cnc,params,errors={}):
+	"0x8d/0x93 handler for {number:short value}, records of maxaxis 8 byte values"
+	def handler(v1,v2,*a):
+		if v1 in errors:
+			return errors[v1]
+		return b''.join(pack(">IhH6xh",n,0,2,params[n])+b'\0'*(cnc.maxaxis-1)*8
+			for n in range(v1,max(v1,v2)+1) if n in params)
+	cnc.handlers[(1,1,0x8d)]=handler
+
+def test_iterparam_range_in_chunks(cnc,conn):
+	_params(cnc,{n:n-3000 for n in range(3000,3100)})
+	conn.maxsubresp=400
+	frames=cnc.frames
+	r=dict(conn.iterparam(3000,3099))
+	assert len(r)==100 and r[3050]=={"type":2,"axis":0,"data":[50]}
+	assert max(len(q) for q in cnc.requests[-2:])>1
+	assert all(c[4]-c[3]<5 for q in cnc.requests[-2:] for c in q)
+	assert cnc.frames-frames<=2
+
+def test_iterparam_numbers(cnc,conn):
+	_params(cnc,{n:n for n in (20,21,3010,6711)})
+	assert [k for k,v in conn.iterparam(numbers=[20,3010,6711])]==[20,3010,6711]
+
+def test_iterparam_diag_reals(cnc,conn):
+	cnc.handlers[(1,1,0x93)]=lambda v1,v2,*a:b''.join(pack(">IhH",n,-1,4)+val8(n/10)*cnc.maxaxis for n in range(v1,v2+1))
+	r=dict(conn.iterparam(300,301,diag=True))
+	assert r[301]["data"]==[30.1]*8
+
+def test_iterparam_raises_on_error(cnc,conn):
+	_params(cnc,{},{1320:5})
+	with pytest.raises(Exception,match="1320-.*error=5"):
+		list(conn.iterparam(1320,1330))
@@ -0,0 +1,15 @@
+import subprocess,sys,os,logging
+from pyfanuc import pyfanuc
+
+ROOT=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_import_keeps_locale():
+	code="import locale;before=locale.setlocale(locale.LC_ALL);import pyfanuc;print(locale.setlocale(locale.LC_ALL)==before)"
+	assert subprocess.check_output([sys.executable,"-c",code],cwd=ROOT).strip()==b"True"
+
+def test_connect_is_silent_and_logs(cnc,capsys,caplog):
+	with caplog.at_level(logging.DEBUG,logger="pyfanuc"):
+		conn=pyfanuc(cnc.host,cnc.port)
+		assert conn.connect() and conn.disconnect()
+	assert capsys.readouterr()==("","")
+	assert any("connected to" in r.getMessage() for r in caplog.records)
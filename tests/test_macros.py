@@ -0,0 +1,22 @@
+def test_readmacros_one_subpacket(cnc,conn):
+	cnc.macros={500:1.5,502:1/3}
+	assert conn.readmacros(500,503)=={500:1.5,501:None,502:0.3333,503:None}
+	assert [c[0:5] for c in cnc.requests[-1]]==[(1,1,0x15,500,503)]
+	assert conn.readmacros(500,503,True)=={500:1.5,501:None,502:1/3,503:None}
+	assert [c[0:5] for c in cnc.requests[-1]]==[(1,1,0xa7,500,503)]
+
+def test_readmacros_splits_ranges(cnc,conn):
+	cnc.macros={n:float(n) for n in range(100,140)}
+	conn.maxsubresp=80
+	assert conn.readmacros(100,139)=={n:float(n) for n in range(100,140)}
+	assert [(c[3],c[4]) for c in cnc.requests[-1]]==[(100,109),(110,119),(120,129),(130,139)]
+
+def test_readmacros_fallback_keeps_double(cnc,conn):
+	cnc.macros={500:1/3,501:2.0}
+	a7=cnc.handlers[(1,1,0xa7)]
+	cnc.handlers[(1,1,0xa7)]=lambda v1,*a:1 if v1==500 else a7(v1,*a)
+	conn.maxsubresp=16
+	assert conn.readmacros(500,503,True)=={500:None,501:2.0,502:None,503:None}
+	cnc.handlers[(1,1,0xa7)]=lambda v1,*a:1 if v1==502 else a7(v1,*a)
+	assert conn.readmacros(500,503,True)=={500:1/3,501:2.0,502:None,503:None}
+	assert all(c[2]==0xa7 for c in cnc.requests[-1])
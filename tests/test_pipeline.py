@@ -0,0 +1,32 @@
+def _setup(cnc,conn):
+	cnc.macros={n:n/4 for n in range(1,301)}
+	conn.maxframe=58 #2 subpackets per frame
+
+def _frames(conn):
+	return conn._req_frames([conn._req_rdsub(1,1,0x15,n,n+7) for n in range(1,300,8)])
+
+def test_pipelined_results_match(cnc,conn):
+	_setup(cnc,conn)
+	frames=_frames(conn)
+	expected=conn._req_rdframes(frames)
+	conn.window=4
+	assert [[bytes(x["data"]) for x in r] for r in conn._req_rdframes(frames)]==[[bytes(x["data"]) for x in r] for r in expected]
+
+def test_fallback_after_stalled_connection(cnc,conn):
+	_setup(cnc,conn)
+	frames=_frames(conn)
+	expected=[[bytes(x["data"]) for x in r] for r in conn._req_rdframes(frames)]
+	conn.window=4
+	conn.sock.settimeout(0.3)
+	cnc.stall=1
+	assert [[bytes(x["data"]) for x in r] for r in conn._req_rdframes(frames)]==expected
+	assert conn.window==4 and cnc.connections==2
+	assert [[bytes(x["data"]) for x in r] for r in conn._req_rdframes(frames)]==expected
+
+def test_early_stop_drains_responses(cnc,conn):
+	_setup(cnc,conn)
+	cnc.macros[1000]=7.0
+	conn.window=4
+	for f,r in conn._req_iterframes(_frames(conn)):
+		break
+	assert conn.readmacro(1000)=={1000:7.0}
@@ -0,0 +1,45 @@
+import pytest
+from fanucpmc import pmcsnapshot
+
+@pytest.fixture
+def pmc(cnc):
+	"PMC memory {section:bytearray}, answered by 02,01,8001"
+	areas={n:bytearray(1000) for n in range(10)}
+	cnc.handlers[(2,1,0x8001)]=lambda v1,v2,v3,*a:bytes(areas[v3][v1:v2+1])
+	return areas
+
+def test_first_poll_fills_image(pmc,conn):
+	pmc[9][10]=0x5a
+	snap=pmcsnapshot(conn,["D0-99",("R",0,9)])
+	assert snap.poll()==[]
+	assert snap.value("D",10)==0x5a
+
+def test_changed_bytes_and_bits(pmc,cnc,conn):
+	conn.maxsubresp=16
+	snap=pmcsnapshot(conn,["D0-99","R0-19"])
+	snap.poll()
+	assert len(cnc.requests[-1])==9
+	pmc[9][3]=0x81
+	pmc[9][40]=0x02
+	pmc[5][19]=0xff
+	changes=snap.poll()
+	assert changes==[("D",3,0,0x81),("D",40,0,0x02),("R",19,0,0xff)]
+	assert snap.bits(changes[0:1])==[("D",3,0,1),("D",3,7,1)]
+	assert snap.bit("D",40,1)==1 and snap.value("R",18,1)==0x00ff
+	assert snap.poll()==[]
+
+def test_failed_chunk_is_refilled(pmc,cnc,conn):
+	snap=pmcsnapshot(conn,["D0-9"])
+	snap.poll()
+	read=cnc.handlers[(2,1,0x8001)]
+	cnc.handlers[(2,1,0x8001)]=lambda *a:5
+	pmc[9][1]=1
+	assert snap.poll()==[]
+	cnc.handlers[(2,1,0x8001)]=read
+	assert snap.poll()==[] and snap.value("D",1)==1
+
+def test_invalid_area(conn):
+	with pytest.raises(ValueError):
+		pmcsnapshot(conn,["Q0-9"])
+	with pytest.raises(ValueError):
+		pmcsnapshot(conn,["D0-9","D10-19"])
@@ -0,0 +1,52 @@
+import json
+from progsync import progsync
+
+LIBRARY="//CNC_MEM/USER/LIBRARY/"
+
+def test_pull_other_folder(cnc,conn,tmp_path):
+	cnc.programs={"//CNC_MEM/USER/PATH1/O3000":"%\nO3000\nM30\n%",LIBRARY+"O5000":"%\nO5000(LIB)\nG0 X1\nM30\n%",
+		LIBRARY+"PART_A":"%\n<PART_A>\nG0 X2\nM30\n%"}
+	sync=progsync(str(tmp_path/"index.json"),str(tmp_path))
+	r=sync.pull(conn,LIBRARY)
+	assert sorted(rec["name"] for rec in r["manifest"])==[LIBRARY+"O5000",LIBRARY+"PART_A"]
+	assert all("error" not in rec for rec in r["manifest"])
+	folder=tmp_path/cnc.host/"CNC_MEM"/"USER"/"LIBRARY"
+	assert (folder/"O5000").read_text()==cnc.programs[LIBRARY+"O5000"]
+	assert (folder/"PART_A").read_text()==cnc.programs[LIBRARY+"PART_A"]
+	assert not (folder/"O3000").exists()
+	index=json.loads((tmp_path/"index.json").read_text())
+	assert sorted(e["name"] for e in index)==["O5000","PART_A"]
+
+def test_pull_unchanged_changed_and_removed(cnc,conn,tmp_path):
+	cnc.programs={LIBRARY+"O5000":"%\nO5000\nM30\n%",LIBRARY+"O5001":"%\nO5001\nM30\n%"}
+	sync=progsync(str(tmp_path/"index.json"),str(tmp_path))
+	sync.pull(conn,LIBRARY)
+	r=sync.pull(conn,LIBRARY)
+	assert r["manifest"]==[] and r["skipped"]==2
+	cnc.mtime=(2024,1,3,0,0,0)
+	cnc.programs[LIBRARY+"O5001"]="%\nO5001\nG0 X1\nM30\n%"
+	del cnc.programs[LIBRARY+"O5000"]
+	r=progsync(str(tmp_path/"index.json"),str(tmp_path)).pull(conn,LIBRARY)
+	assert r["removed"]==["O5000"] and [rec["name"] for rec in r["manifest"]]==[LIBRARY+"O5001"]
+
+def test_pull_current_folder_by_number(cnc,conn,tmp_path):
+	cnc.programs={"O3000":"%\nO3000(SAMPLE)\nM30\n%"}
+	sync=progsync(str(tmp_path/"index.json"),str(tmp_path))
+	r=sync.pull(conn)
+	assert [rec["name"] for rec in r["manifest"]]==[3000]
+	assert (tmp_path/cnc.host/"O3000").read_text()==cnc.programs["O3000"]
+
+def test_push_changed(cnc,conn,tmp_path):
+	cnc.programs={LIBRARY+"O5000":"%\nO5000\nM30\n%"}
+	sync=progsync(str(tmp_path/"index.json"),str(tmp_path))
+	folder=tmp_path/cnc.host/"CNC_MEM"/"USER"/"LIBRARY"
+	folder.mkdir(parents=True)
+	(folder/"O6000").write_text("%\nO6000\nM30\n%")
+	r=sync.push(conn,LIBRARY)
+	assert len(r["manifest"])==1 and "error" not in r["manifest"][0]
+	assert cnc.programs[LIBRARY+"O6000"]=="%\nO6000\nM30\n%"
+	assert sync.push(conn,LIBRARY)["skipped"]==1
+	(folder/"O6000").write_text("%\nO6000\nG0 X1\nM30\n%")
+	r=sync.push(conn,LIBRARY)
+	assert [rec["action"] for rec in r["manifest"]]==["delete","upload"]
+	assert cnc.programs[LIBRARY+"O6000"]=="%\nO6000\nG0 X1\nM30\n%"
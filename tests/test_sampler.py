@@ -0,0 +1,49 @@
+import math,time
+import pytest
+from conftest import val8
+from pyfanuc import pyfanuc
+from sampler import axissampler
+
+@pytest.fixture
+def positions(cnc):
+	"axis positions {type:[values]} answered by 01,01,26"
+	pos={4:[1.5,-2.25]+[0]*6,6:[0.5]*8}
+	cnc.handlers[(1,1,0x26)]=lambda v1,*a:b''.join(val8(v) for v in pos[v1]) if v1 in pos else 6
+	return pos
+
+def test_sample_ring(positions,cnc,conn):
+	s=axissampler(conn,pyfanuc.ABS|pyfanuc.REL,samples=4)
+	assert s.types==["ABS","REL"]
+	frames=cnc.frames
+	for n in range(6):
+		positions[4][0]=n
+		assert s.sample()
+	assert cnc.frames-frames==6
+	times,values=s.window()
+	assert len(times)==4 and list(times)==sorted(times)
+	if s.numpy is not None:
+		assert [row[0][0] for row in values.tolist()]==[2,3,4,5]
+		assert values[-1][1][0]==0.5
+	else:
+		assert [values[n*s.row] for n in range(4)]==[2,3,4,5]
+	assert len(s.window(2)[0])==2
+
+def test_sample_error_is_nan(positions,conn):
+	s=axissampler(conn,pyfanuc.ABS|pyfanuc.DIST)
+	assert not s.sample()
+	times,values=s.window()
+	v=values.tolist()[0] if s.numpy is not None else [list(values[0:8]),list(values[8:16])]
+	assert v[0][1]==-2.25 and all(math.isnan(x) for x in v[1])
+
+def test_run_and_stop(positions,conn):
+	s=axissampler(conn)
+	for i in range(20):
+		s.start(1000)
+		s.stop()
+	assert not s.running and s.thread is None
+	s.run(1000,3)
+	assert s.count>=3
+	s.start(200)
+	time.sleep(0.05)
+	s.stop()
+	assert s.count>3 and s.thread is None
@@ -0,0 +1,60 @@
+from fanucsim import fanucsim
+from fanucpool import fanucpool
+from pyfanuc import pyfanuc,pyfanucstats
+from sampler import axissampler
+
+def test_counters_and_errors(sim):
+	stats=pyfanucstats()
+	calls=[]
+	stats.hooks.append(lambda ip,subs,results,seconds:calls.append((len(subs),results is None)))
+	conn=pyfanuc(sim.host,sim.port,stats=stats)
+	assert conn.connect()
+	b=conn.batch()
+	b.readmacro(1,3)
+	b.readactspindlespeed()
+	b.execute()
+	s=stats.snapshot()
+	m=s["machines"][sim.host]
+	assert m["connects"]==1 and m["frames"]==2 and m["sent"]>0 and m["received"]>0
+	c={x["command"]:x for x in s["commands"]}
+	assert c[(1,1,0x15)]["subpackets"]==3 and c[(1,1,0x15)]["frames"]==1 and c[(1,1,0x15)]["received"]==24
+	assert c[(1,1,0x25)]["errors"]=={1:1}
+	assert sum(c[(1,1,0x15)]["histogram"])==1
+	assert calls[-1]==(4,False)
+	stats.reset()
+	assert stats.snapshot()=={"machines":{},"commands":[]}
+
+def test_pipeline_fallback_counts_reconnect(sim):
+	sim.macros={n:float(n) for n in range(1,301)}
+	stats=pyfanucstats()
+	conn=pyfanuc(sim.host,sim.port,stats=stats)
+	assert conn.connect()
+	conn.maxsubresp=64;conn.maxresp=256
+	conn.window=4
+	conn.sock.settimeout(0.3)
+	sim.stall=1
+	assert conn.readmacros(1,300)=={n:float(n) for n in range(1,301)}
+	m=stats.snapshot()["machines"][sim.host]
+	assert m["timeouts"]==1 and m["reconnects"]==1 and m["connects"]==2
+
+def test_pool_replacement_counts_reconnect(sim):
+	stats=pyfanucstats()
+	pool=fanucpool(checkafter=0,stats=stats)
+	a=pool.acquire(sim.host,sim.port)
+	pool.release(a)
+	a.sock.close()
+	b=pool.acquire(sim.host,sim.port)
+	assert b is not a
+	m=stats.snapshot()["machines"][sim.host]
+	assert m["connects"]==2 and m["reconnects"]==1
+	pool.closeall()
+
+def test_sampler_frames(sim):
+	stats=pyfanucstats()
+	conn=pyfanuc(sim.host,sim.port,stats=stats)
+	assert conn.connect()
+	s=axissampler(conn,pyfanuc.ABS|pyfanuc.REL)
+	for n in range(5):
+		s.sample()
+	c={x["command"]:x for x in stats.snapshot()["commands"]}
+	assert c[(1,1,0x26)]["frames"]==5 and c[(1,1,0x26)]["subpackets"]==10
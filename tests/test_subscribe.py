@@ -0,0 +1,57 @@
+import asyncio
+from aiofanuc import AsyncFanuc
+from subscribe import subscription
+
+def test_reports_changes_only(sim,simconn):
+	sub=subscription(simconn,{"stat":("getstatinfo",()),"macro":("readmacro",(500,))})
+	first=sub.poll()
+	assert set(first)=={"stat","macro"} and first["macro"]=={500:None}
+	assert sub.poll()=={}
+	sim.macros[500]=1.0
+	assert sub.poll()=={"macro":{500:1.0}}
+	sim.statinfo["run"]=3
+	assert sub.poll()["stat"]["run"]==3
+
+def test_unchanged_payload_not_decoded(sim,simconn,monkeypatch):
+	sub=subscription(simconn,{"macros":("readmacros",(1,20))})
+	sub.poll()
+	calls=[]
+	dec=sub.signals[0][3]
+	sub.signals[0]=sub.signals[0][0:3]+(lambda *a:calls.append(1) or dec(*a),)+sub.signals[0][4:]
+	assert sub.poll()=={} and calls==[]
+	sim.macros[5]=2.0
+	assert sub.poll()["macros"][5]==2.0 and calls==[1]
+
+def test_deadband(sim,simconn):
+	sub=subscription(simconn,{"feed":("readactfeed",(),5),"axes":("readaxes",(),0.5)})
+	sub.poll()
+	sim.feed=3.0
+	sim.positions[4][0]+=0.2
+	assert sub.poll()=={}
+	sim.feed=6.0
+	assert sub.poll()=={"feed":6.0}
+	sim.feed=9.0
+	sim.positions[4][0]+=0.2
+	assert sub.poll()=={}
+	sim.positions[4][0]+=0.2
+	assert list(sub.poll())==["axes"]
+	assert sub.values["feed"]==6.0
+
+def test_error_signal_reported_as_none(sim,simconn):
+	sub=subscription(simconn,{"speed":("readactspindlespeed",()),"feed":("readactfeed",())})
+	assert sub.poll()=={"speed":None,"feed":0.0}
+
+def test_batch_and_async(sim,simconn):
+	sub=subscription(simconn,{"macro":("readmacro",(7,))})
+	b=simconn.batch()
+	b.add(sub.query)
+	b.getstatinfo()
+	assert b.execute()[0]=={"macro":{7:None}}
+	sim.macros[7]=1.5
+	async def main():
+		conn=AsyncFanuc(sim.host,sim.port)
+		assert await conn.connect()
+		r=await sub.template.execute(conn)
+		await conn.disconnect()
+		return r
+	assert asyncio.run(main())=={"macro":{7:1.5}}
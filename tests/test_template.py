@@ -0,0 +1,45 @@
+import asyncio
+from pyfanuc import pyfanuc
+from aiofanuc import AsyncFanuc
+
+def test_prepare_encapsulates_once(cnc,conn,monkeypatch):
+	cnc.macros={1:1.5,3:2.0}
+	t=conn.prepare("readmacro",1,3)
+	calls=[]
+	encap=conn._encap
+	monkeypatch.setattr(conn,"_encap",lambda *a:calls.append(a) or encap(*a))
+	frames=cnc.frames
+	for n in range(3):
+		assert t.execute()=={1:1.5,2:None,3:2.0}
+	cnc.macros[2]=4.0
+	assert t.execute()[2]==4.0
+	assert calls==[] and cnc.frames-frames==4
+
+def test_prepare_batch_split(cnc,conn):
+	cnc.macros={n:float(n) for n in range(50)}
+	conn.maxframe=300
+	b=conn.batch()
+	b.readmacro(0,9)
+	b.getstatinfo()
+	b.readmacros(10,49)
+	t=b.prepare()
+	assert len(t.frames)>1
+	frames=cnc.frames
+	r=t.execute()
+	assert r[0]=={n:float(n) for n in range(10)} and r[1]["aut"]==1 and r[2]=={n:float(n) for n in range(10,50)}
+	assert cnc.frames-frames==len(t.frames)
+
+def test_execute_on_other_sessions(cnc,conn):
+	cnc.macros={7:7.0}
+	t=conn.prepare(conn._q_readmacro(7))
+	other=pyfanuc(cnc.host,cnc.port)
+	assert other.connect()
+	assert t.execute(other)=={7:7.0}
+	async def main():
+		aconn=AsyncFanuc(cnc.host,cnc.port)
+		assert await aconn.connect()
+		r=await t.execute(aconn)
+		await aconn.disconnect()
+		return r
+	assert asyncio.run(main())=={7:7.0}
+	other.sock.close()
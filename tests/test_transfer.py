@@ -0,0 +1,42 @@
+import io,json
+from transfer import transfermanager
+
+TEXT="%\nO3000(SAMPLE)\nG0 G90 X0 Y0\nM30\n%"
+
+def test_download_manifest_per_run(cnc):
+	cnc.programs={"O3000":TEXT,"//CNC_MEM/USER/PATH1/O3000":TEXT}
+	tm=transfermanager(retries=0)
+	tm.download((cnc.host,cnc.port),3000)
+	first=tm.run()
+	assert len(first)==1 and first[0]["content"]==TEXT
+	tm.download((cnc.host,cnc.port),"//CNC_MEM/USER/PATH1/O3000",io.BytesIO())
+	second=tm.run()
+	assert len(second)==1 and second[0]["bytes"]==len(TEXT)
+	assert len(first)==1 and tm.manifest is second
+
+def test_parallel_sessions(cnc,tmp_path):
+	cnc.programs={"//CNC_MEM/O%i" % n:TEXT.replace("3000",str(n)) for n in range(10)}
+	tm=transfermanager(sessions=3,retries=0)
+	for n in range(10):
+		tm.download((cnc.host,cnc.port),"//CNC_MEM/O%i" % n,str(tmp_path/("O%i" % n)))
+	manifest=tm.run()
+	assert sorted(r["name"] for r in manifest)==sorted("//CNC_MEM/O%i" % n for n in range(10))
+	assert all("error" not in r and r["attempts"]==1 for r in manifest)
+	assert (tmp_path/"O7").read_text()==cnc.programs["//CNC_MEM/O7"]
+	tm.savemanifest(str(tmp_path/"manifest.json"))
+	assert len(json.loads((tmp_path/"manifest.json").read_text()))==10
+
+def test_upload_and_delete(cnc):
+	tm=transfermanager(retries=0)
+	tm.upload((cnc.host,cnc.port),"//CNC_MEM/USER/LIBRARY/",io.BytesIO(b"%\nO7000\nM30\n%"))
+	assert "error" not in tm.run()[0]
+	assert "//CNC_MEM/USER/LIBRARY/O7000" in cnc.programs
+	tm.delete((cnc.host,cnc.port),"//CNC_MEM/USER/LIBRARY/O7000")
+	assert "error" not in tm.run()[0]
+	assert "//CNC_MEM/USER/LIBRARY/O7000" not in cnc.programs
+
+def test_failed_job_retried(tmp_path):
+	tm=transfermanager(retries=1,retrydelay=0)
+	tm.download(("127.0.0.1",1),3000,str(tmp_path/"O3000"))
+	r=tm.run()[0]
+	assert r["attempts"]==2 and isinstance(r["error"],OSError)
@@ -0,0 +1,27 @@
+import io
+import pytest
+
+TEXT="%\nO1000\n"+"G01 X1.0\n"*1000+"M30\n%"
+
+def test_uploadprog_str_and_progress(cnc,conn):
+	progress=[]
+	assert conn.uploadprog("//CNC_MEM/USER/PATH1/",TEXT,lambda b,r:progress.append(b),chunksize=0x400,frames=4)
+	assert cnc.programs["//CNC_MEM/USER/PATH1/O1000"]==TEXT
+	assert progress[-1]==len(TEXT) and len(progress)==3
+	with pytest.raises(Exception,match="already exists"):
+		conn.uploadprog("//CNC_MEM/USER/PATH1/",TEXT)
+
+def test_uploadprog_streaming_source(cnc,conn):
+	blocks=["%\nO1001\n"]+["G01 X%i.0\n" % n for n in range(500)]+[b"M30\n%"]
+	assert conn.uploadprog("//CNC_MEM/USER/PATH1/",iter(blocks),chunksize=100)
+	assert cnc.programs["//CNC_MEM/USER/PATH1/O1001"]=="".join(b if isinstance(b,str) else b.decode() for b in blocks)
+
+def test_uploadfile(cnc,conn,tmp_path):
+	(tmp_path/"O1000").write_bytes(TEXT.encode())
+	assert conn.uploadfile("//MEMCARD/",str(tmp_path/"O1000"))
+	assert conn.uploadfile("//CNC_MEM/",io.BytesIO(TEXT.encode()),chunksize=0x1000,frames=1)
+	assert cnc.programs["//MEMCARD/O1000"]==cnc.programs["//CNC_MEM/O1000"]==TEXT
+
+def test_uploadchunks_sizes(conn):
+	sizes=[len(c) for c in conn._uploadchunks(["ab"*10,b"x"*35,"y"],16)]
+	assert sizes==[16,16,16,8]
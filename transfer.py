@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+import time,json,threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pyfanuc import pyfanuc
+
+class transfermanager(object):
+	"""
+	Run queued program downloads, uploads and deletes for many machines
+	every machine gets at most sessions parallel file transfer sockets, all on a pool of workers threads,
+	failed jobs are retried up to retries times after retrydelay seconds,
+	run() returns the manifest, one dict per job with
+	"machine","action","name","local" (file path),"bytes","seconds","rate","attempts" and "error" if it failed
+	"""
+	def __init__(self,sessions=2,workers=32,retries=2,retrydelay=1):
+		self.sessions=sessions
+		self.workers=workers
+		self.retries=retries
+		self.retrydelay=retrydelay
+		self.jobs={} #(ip,port) -> deque of jobs
+		self.manifest=[]
+		self.lock=threading.Lock()
+
+	def download(self,machine,name,target=None):
+		"""
+		queue download of program name (number, name in the current folder or full path like //CNC_MEM/USER/PATH1/O1234)
+		to target (path or binary file object, None keeps text in manifest)
+		"""
+		self._add(machine,{"action":"download","name":name,"target":target})
+	def upload(self,machine,fullpath,source):
+		"queue upload of source (path or file object) into folder fullpath"
+		self._add(machine,{"action":"upload","name":fullpath,"source":source})
+	def delete(self,machine,fullpath):
+		"queue delete of program fullpath"
+		self._add(machine,{"action":"delete","name":fullpath})
+	def run(self):
+		"run all queued jobs, returns their manifest (savemanifest writes the one of the last run)"
+		self.manifest=[]
+		with ThreadPoolExecutor(max_workers=self.workers) as pool:
+			for key,jobs in self.jobs.items():
+				conn=pyfanuc(key[0],key[1])
+				ctrl={"conn":None,"lock":threading.Lock()}
+				for t in range(min(self.sessions,len(jobs))):
+					pool.submit(self._worker,conn,ctrl,jobs)
+		self.jobs={}
+		return self.manifest
+	def savemanifest(self,path):
+		"write manifest as json (without downloaded text)"
+		with open(path,"w") as f:
+			json.dump([{k:v for k,v in r.items() if k!="content"} for r in self.manifest],f,indent=1,default=str)
+
+	def _add(self,machine,job):
+		"intern function - queue job for machine ip or (ip,port)"
+		key=(machine,8193) if isinstance(machine,str) else tuple(machine)
+		self.jobs.setdefault(key,deque()).append(job)
+	def _worker(self,conn,ctrl,jobs):
+		"intern function - work off jobs of one machine"
+		try:
+			while True:
+				try:
+					job=jobs.popleft()
+				except IndexError:
+					return
+				record=self._run(conn,ctrl,job)
+				with self.lock:
+					self.manifest.append(record)
+		finally:
+			with ctrl["lock"]:
+				if ctrl["conn"] is not None and not jobs:
+					try:
+						ctrl["conn"].disconnect()
+						ctrl["conn"].sock.close()
+					except OSError:
+						pass
+					ctrl["conn"]=None
+	def _run(self,conn,ctrl,job):
+		"intern function - run one job with retries"
+		local=job.get("target",job.get("source"))
+		record={"machine":conn.ip,"action":job["action"],"name":job["name"],"local":local if isinstance(local,str) else None,
+			"bytes":0,"attempts":0}
+		start=time.monotonic()
+		while True:
+			record["attempts"]+=1
+			try:
+				record["bytes"]=self._transfer(conn,ctrl,job,record)
+				record.pop("error",None)
+				break
+			except Exception as e:
+				record["error"]=e
+				if record["attempts"]>self.retries:
+					break
+				time.sleep(self.retrydelay)
+		record["seconds"]=time.monotonic()-start
+		record["rate"]=record["bytes"]/record["seconds"] if record["seconds"]>0 else 0
+		return record
+	def _transfer(self,conn,ctrl,job,record):
+		"intern function - one attempt of job, returns transferred bytes"
+		if job["action"]=="download":
+			if job["target"] is None:
+				text=conn.getprog(job["name"])
+				n=-1 if text==-1 else len(text.encode())
+				record["content"]=text
+			else:
+				if hasattr(job["target"],"seek"):
+					job["target"].seek(0)
+					job["target"].truncate()
+				n=conn.saveprog(job["name"],job["target"])
+			if n<0:
+				raise Exception("Download of %s failed" % job["name"])
+			return n
+		if job["action"]=="upload":
+			n=[0]
+			if hasattr(job["source"],"seek"):
+				job["source"].seek(0)
+			conn.uploadfile(job["name"],job["source"],lambda b,r:n.__setitem__(0,b))
+			return n[0]
+		with ctrl["lock"]:
+			if ctrl["conn"] is None:
+				c=pyfanuc(conn.ip,conn.port)
+				if not c.connect():
+					raise ConnectionError("no OPN response from %s:%i" % (conn.ip,conn.port))
+				ctrl["conn"]=c
+			try:
+				ctrl["conn"].deleteprog(job["name"])
+			except OSError:
+				ctrl["conn"].sock.close()
+				ctrl["conn"]=None
+				raise
+		return 0